@@ -1,21 +1,32 @@
+import argparse
+
 import tcod as libtcod
 
 from death_functions import kill_monster, kill_player
 from entity import get_blocking_entities_at_location
-from fov_functions import initialize_fov, recompute_fov
+from fov_functions import FovCache, initialize_fov, recompute_fov
 from game_messages import Message
 from game_states import GameStates
 from input_handler import handle_keys, handle_mouse, handle_main_menu
 from loader_functions.initialize_new_game import get_constants, get_game_variables
-from loader_functions.data_loaders import load_game, save_game
+from loader_functions.data_loader import load_game, save_game
+from map_objects.floor_prefetch import FloorPrefetcher
 from menu import main_menu, message_box
-from render_function import clear_all, render_all
+from render_function import RenderCache, clear_all, render_all, viewport_origin
+from renderers import RENDERERS, TcodRenderer, new_renderer
 
 
-def play_game(player, entities, game_map, message_log, game_state, con, panel, constants):
+def play_game(player, entities, game_map, message_log, game_state, con, panel, constants, renderer):
     fov_recompute = True
 
+    # The FOV map covers the chunks around the player (the whole floor, unless it is chunked)
+    game_map.update_chunks(player.x, player.y)
     fov_map = initialize_fov(game_map)
+    fov_cache = FovCache(constants['fov_cache_size']) if constants['fov_cache_size'] else None
+    render_cache = RenderCache()
+
+    floor_prefetcher = FloorPrefetcher(constants)
+    floor_prefetcher.start(game_map)
 
     key = libtcod.Key()
     mouse = libtcod.Mouse()
@@ -25,22 +36,38 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
 
     targeting_item = None
 
-    while not libtcod.console_is_window_closed():
-        libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
+    # Draw only when something may have changed: the first frame, input, an animation tick
+    render_needed = True
+    hover_cell = None
 
+    while not renderer.is_closed():
         if fov_recompute:
             recompute_fov(fov_map, player.x, player.y, constants['fov_radius'], constants['fov_light_walls'],
-                          constants['fov_algorithm'])
+                          constants['fov_algorithm'], fov_cache, game_map.version)
+
+        if render_needed and renderer.draws:
+            render_all(con, panel, entities, player, game_map, fov_map, fov_recompute, message_log,
+                       constants['screen_width'], constants['screen_height'], constants['bar_width'],
+                       constants['panel_height'], constants['panel_y'], mouse, constants['colors'], game_state,
+                       render_cache, renderer.root)
 
-        render_all(con, panel, entities, player, game_map, fov_map, fov_recompute, message_log,
-                   constants['screen_width'], constants['screen_height'], constants['bar_width'],
-                   constants['panel_height'], constants['panel_y'], mouse, constants['colors'], game_state)
+            fov_recompute = False
 
-        fov_recompute = False
+            renderer.present()
 
-        libtcod.console_flush()
+            clear_all(con, entities, render_cache)
+        elif not renderer.draws:
+            # The null renderer never draws; the FOV above is still needed by the monsters and items
+            fov_recompute = False
 
-        clear_all(con, entities)
+        got_input = renderer.wait_for_input(key, mouse, constants)
+
+        # A key press, a click or the mouse reaching another cell (new hover names) can change the screen;
+        # mouse movement within a cell or an idle poll can't
+        render_needed = (key.vk != libtcod.KEY_NONE or mouse.lbutton_pressed or mouse.rbutton_pressed or
+                         (mouse.cx, mouse.cy) != hover_cell or
+                         (not got_input and constants['animation_interval'] is not None))
+        hover_cell = (mouse.cx, mouse.cy)
 
         action = handle_keys(key, game_state)
         mouse_action = handle_mouse(mouse)
@@ -75,6 +102,11 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
                     player_turn_results.extend(attack_results)
                 else:
                     player.move(dx, dy)
+                    game_map.update_chunks(player.x, player.y)
+
+                    if fov_map.window != game_map.hot_window():
+                        # Walked into a new chunk: the FOV map follows the chunks kept around the player
+                        fov_map = initialize_fov(game_map)
 
                     fov_recompute = True
 
@@ -84,8 +116,8 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
             game_state = GameStates.ENEMY_TURN
 
         elif pickup and game_state == GameStates.PLAYERS_TURN:
-            for entity in entities:
-                if entity.item and entity.x == player.x and entity.y == player.y:
+            for entity in entities.at(player.x, player.y):
+                if entity.item:
                     pickup_results = player.inventory.add_item(entity)
                     player_turn_results.extend(pickup_results)
 
@@ -111,12 +143,16 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
                 player_turn_results.extend(player.inventory.drop_item(item))
 
         if take_stairs and game_state == GameStates.PLAYERS_TURN:
-            for entity in entities:
-                if entity.stairs and entity.x == player.x and entity.y == player.y:
-                    entities = game_map.next_floor(player, message_log, constants)
+            for entity in entities.at(player.x, player.y):
+                if entity.stairs:
+                    floor = floor_prefetcher.take(game_map)
+                    entities = game_map.next_floor(player, message_log, constants, floor)
+                    floor_prefetcher.start(game_map)
+
                     fov_map = initialize_fov(game_map)
                     fov_recompute = True
                     libtcod.console_clear(con)
+                    render_cache.reset()
 
                     break
             else:
@@ -142,8 +178,11 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
             game_state = GameStates.CHARACTER_SCREEN
 
         if game_state == GameStates.TARGETING:
-            if left_click:
-                target_x, target_y = left_click
+            if left_click and left_click[1] < constants['panel_y']:
+                # The click is on a console cell above the panel; the map view starts at the viewport origin
+                origin_x, origin_y = viewport_origin(player, game_map, constants['screen_width'],
+                                                     constants['panel_y'])
+                target_x, target_y = left_click[0] + origin_x, left_click[1] + origin_y
 
                 item_use_results = player.inventory.use(targeting_item, entities=entities, fov_map=fov_map,
                                                         target_x=target_x, target_y=target_y)
@@ -158,11 +197,12 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
                 player_turn_results.append({'targeting_cancelled': True})
             else:
                 save_game(player, entities, game_map, message_log, game_state)
+                floor_prefetcher.shutdown()
 
                 return True
 
         if fullscreen:
-            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())
+            renderer.toggle_fullscreen()
 
         for player_turn_result in player_turn_results:
             message = player_turn_result.get('message')
@@ -223,7 +263,11 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
                     game_state = GameStates.LEVEL_UP
 
         if game_state == GameStates.ENEMY_TURN:
-            for entity in entities:
+            # Catch the shared A* map up with the player's move and anything killed, picked up or dropped
+            game_map.get_walk_map(entities).sync(entities)
+
+            # Only the entities with an AI, copied from the store's live set since a turn can change it
+            for entity in list(entities.having('ai')):
                 if entity.ai:
                     enemy_turn_results = entity.ai.take_turn(player, fov_map, game_map, entities)
 
@@ -250,13 +294,15 @@ def play_game(player, entities, game_map, message_log, game_state, con, panel, c
             else:
                 game_state = GameStates.PLAYERS_TURN
 
+    floor_prefetcher.shutdown()
 
-def main():
-    constants = get_constants()
 
-    libtcod.console_set_custom_font('arial12x12.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+def main(constants=None, renderer=None):
+    if constants is None:
+        constants = get_constants()
 
-    libtcod.console_init_root(constants['screen_width'], constants['screen_height'], constants['window_title'], False)
+    if renderer is None:
+        renderer = TcodRenderer(constants)
 
     con = libtcod.console_new(constants['screen_width'], constants['screen_height'])
     panel = libtcod.console_new(constants['screen_width'], constants['panel_height'])
@@ -270,22 +316,28 @@ def main():
     show_main_menu = True
     show_load_error_message = False
 
-    main_menu_background_image = libtcod.image_load('menu_background.png')
+    main_menu_background_image = None
+
+    if isinstance(renderer, TcodRenderer):
+        main_menu_background_image = libtcod.image_load('menu_background.png')
 
     key = libtcod.Key()
     mouse = libtcod.Mouse()
 
-    while not libtcod.console_is_window_closed():
-        libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
-
+    while not renderer.is_closed():
         if show_main_menu:
-            main_menu(con, main_menu_background_image, constants['screen_width'],
-                      constants['screen_height'])
+            if renderer.draws:
+                main_menu(con, main_menu_background_image, constants['screen_width'],
+                          constants['screen_height'], renderer.root)
 
-            if show_load_error_message:
-                message_box(con, 'No save game to load', 50, constants['screen_width'], constants['screen_height'])
+                if show_load_error_message:
+                    message_box(con, 'No save game to load', 50, constants['screen_width'], constants['screen_height'],
+                                renderer.root)
 
-            libtcod.console_flush()
+                renderer.present()
+
+            # The menu only changes on input, so wait for some
+            renderer.wait_for_input(key, mouse, constants)
 
             action = handle_main_menu(key)
 
@@ -318,10 +370,34 @@ def main():
 
         else:
             libtcod.console_clear(con)
-            play_game(player, entities, game_map, message_log, game_state, con, panel, constants)
+            play_game(player, entities, game_map, message_log, game_state, con, panel, constants, renderer)
 
             show_main_menu = True
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Play Basic Dungeon.')
+    parser.add_argument('--renderer', choices=sorted(RENDERERS), default='tcod',
+                        help='tcod opens the window; offscreen and null run without a display (default: tcod)')
+    parser.add_argument('--keys', default='',
+                        help='comma-separated key script for offscreen and null, e.g. a,right,right,g,escape,d')
+    parser.add_argument('--dump', default=None, help='with offscreen, save the last frame to this .txt or .png file')
+    args = parser.parse_args()
+
+    # Only the off-screen console keeps a frame to save
+    if args.dump and args.renderer != 'offscreen':
+        parser.error('--dump needs --renderer offscreen')
+
+    return args
+
+
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+
+    constants = get_constants()
+    renderer = new_renderer(args.renderer, constants, args.keys.split(',') if args.keys else ())
+
+    main(constants, renderer)
+
+    if args.dump:
+        renderer.dump(args.dump)
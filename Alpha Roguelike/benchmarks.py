@@ -0,0 +1,232 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import tcod as libtcod
+
+from components.ai import BasicMonster
+from components.fighter import Fighter
+from components.item import Item
+from Engine import play_game
+from entity import Entity
+from entity_store import EntityStore
+from fov_functions import initialize_fov, recompute_fov
+from game_messages import Message
+from item_functions import heal
+from loader_functions.initialize_new_game import get_constants, get_game_variables
+from map_objects.game_map import GameMap
+from map_objects.rectangle import Rect
+from render_function import RenderCache, RenderOrder, render_map
+from renderers import new_renderer
+
+
+MAP_SIZES = [(80, 43), (500, 500), (2000, 2000)]
+
+ENTITY_COUNT = 10000
+
+RENDER_SIZES = [(80, 43), (500, 500)]
+
+RENDER_FRAMES = 40
+
+TURN_COUNT = 2000
+
+TURN_KEYS = ['up', 'down', 'left', 'right', 'kp1', 'kp3', 'kp7', 'kp9', 'kp5']
+
+
+def best_time(function, *args, repeat=3):
+    # Best wall-clock time of a few runs, in milliseconds
+    best = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def benchmark_map(width, height):
+    # Rooms on a regular grid, so every size has a similar mix of wall and floor
+    game_map = GameMap(width, height)
+
+    for x in range(0, width - 10, 12):
+        for y in range(0, height - 10, 12):
+            game_map.create_room(Rect(x, y, 10, 10))
+
+    return game_map
+
+
+def initialize_fov_per_cell(game_map):
+    # The one-call-per-tile construction initialize_fov used before the bulk copy
+    fov_map = libtcod.map_new(game_map.width, game_map.height)
+
+    for y in range(game_map.height):
+        for x in range(game_map.width):
+            libtcod.map_set_properties(fov_map, x, y, not game_map.tiles['block_sight'][x, y],
+                                       not game_map.tiles['blocked'][x, y])
+
+    return fov_map
+
+
+def bench_fov():
+    print('initialize_fov: per-cell vs bulk copy')
+
+    for width, height in MAP_SIZES:
+        game_map = benchmark_map(width, height)
+
+        per_cell = best_time(initialize_fov_per_cell, game_map, repeat=1)
+        bulk = best_time(initialize_fov, game_map)
+
+        print('  {0}x{1}: {2:.2f} ms -> {3:.2f} ms ({4:.0f}x)'.format(width, height, per_cell, bulk,
+                                                                      per_cell / bulk))
+
+
+def render_map_per_cell(con, game_map, fov_map, colors, width, height, render_cache=None):
+    # The one-call-per-tile full repaint render_all did before the map was painted as whole arrays
+    block_sight = game_map.tiles['block_sight']
+    explored = game_map.tiles['explored']
+
+    for y in range(height):
+        for x in range(width):
+            visible = libtcod.map_is_in_fov(fov_map, x, y)
+            wall = block_sight[x, y]
+
+            if visible:
+                if wall:
+                    libtcod.console_set_char_background(con, x, y, colors.get('light_wall'), libtcod.BKGND_SET)
+                else:
+                    libtcod.console_set_char_background(con, x, y, colors.get('light_ground'), libtcod.BKGND_SET)
+
+                explored[x, y] = True
+            elif explored[x, y]:
+                if wall:
+                    libtcod.console_set_char_background(con, x, y, colors.get('dark_wall'), libtcod.BKGND_SET)
+                else:
+                    libtcod.console_set_char_background(con, x, y, colors.get('dark_ground'), libtcod.BKGND_SET)
+
+
+def render_frames(paint, game_map, render_cache):
+    # Mean ms per paint call while walking back and forth across the first room, one FOV change a frame
+    colors = get_constants()['colors']
+    con = libtcod.console_new(game_map.width, game_map.height)
+    fov_map = initialize_fov(game_map)
+    elapsed = 0
+
+    for frame in range(RENDER_FRAMES):
+        x = 1 + abs(frame % 16 - 8)
+        recompute_fov(fov_map, x, 5, 10)
+
+        start = time.perf_counter()
+        paint(con, game_map, fov_map, colors, game_map.width, game_map.height, render_cache)
+        elapsed += time.perf_counter() - start
+
+    return elapsed * 1000 / RENDER_FRAMES
+
+
+def bench_render():
+    print('render_map: per-cell full repaint, array full repaint, array changed cells only (ms per frame)')
+
+    for width, height in RENDER_SIZES:
+        per_cell = render_frames(render_map_per_cell, benchmark_map(width, height), None)
+        full = render_frames(render_map, benchmark_map(width, height), None)
+        dirty = render_frames(render_map, benchmark_map(width, height), RenderCache())
+
+        print('  {0}x{1}: {2:.2f} ms, {3:.2f} ms, {4:.2f} ms'.format(width, height, per_cell, full, dirty))
+
+
+def benchmark_entities(count):
+    # Half monsters, half potions, spread over a 500x500 floor like make_map would place them
+    entities = EntityStore()
+
+    for i in range(count):
+        x, y = i % 500, i // 500
+
+        if i % 2:
+            entities.append(Entity(x, y, 'o', libtcod.desaturated_green, 'Orc', blocks=True,
+                                   render_order=RenderOrder.ACTOR, fighter=Fighter(hp=20, sp=0, mp=0, defense=0,
+                                                                                   power=4, xp=35),
+                                   ai=BasicMonster()))
+        else:
+            entities.append(Entity(x, y, '!', libtcod.violet, 'Healing Potion', render_order=RenderOrder.ITEM,
+                                   item=Item(use_function=heal, amount=40)))
+
+    return entities
+
+
+def traced_bytes(function, *args):
+    # Bytes still allocated once function returns, and what it returned so that stays alive while measured
+    tracemalloc.start()
+    result = function(*args)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return allocated, result
+
+
+def bench_memory():
+    print('memory: {0} of each'.format(ENTITY_COUNT))
+
+    allocated, entities = traced_bytes(benchmark_entities, ENTITY_COUNT)
+    print('  entities (with components): {0:.0f} bytes each'.format(allocated / ENTITY_COUNT))
+
+    allocated, messages = traced_bytes(lambda count: [Message('The orc is dead!', libtcod.orange)
+                                                      for i in range(count)], ENTITY_COUNT)
+    print('  messages: {0:.0f} bytes each'.format(allocated / ENTITY_COUNT))
+
+    allocated, rects = traced_bytes(lambda count: [Rect(i, i, 10, 10) for i in range(count)], ENTITY_COUNT)
+    print('  rects: {0:.0f} bytes each'.format(allocated / ENTITY_COUNT))
+
+
+def play_turns(renderer_name):
+    # Turns per second over TURN_COUNT random moves on the same seeded floor, with no window
+    constants = get_constants()
+    constants['seed'] = 1
+
+    rng = random.Random(1)
+    keys = [rng.choice(TURN_KEYS) for i in range(TURN_COUNT)]
+    renderer = new_renderer(renderer_name, constants, keys)
+
+    player, entities, game_map, message_log, game_state = get_game_variables(constants)
+    con = libtcod.console_new(constants['screen_width'], constants['screen_height'])
+    panel = libtcod.console_new(constants['screen_width'], constants['panel_height'])
+
+    start = time.perf_counter()
+    play_game(player, entities, game_map, message_log, game_state, con, panel, constants, renderer)
+
+    return renderer.turns / (time.perf_counter() - start)
+
+
+def bench_turns():
+    print('play_game: {0} scripted turns, drawn off-screen vs not drawn (turns per second)'.format(TURN_COUNT))
+
+    print('  offscreen: {0:.0f}, null: {1:.0f}'.format(play_turns('offscreen'), play_turns('null')))
+
+
+BENCHMARKS = {
+    'fov': bench_fov,
+    'memory': bench_memory,
+    'render': bench_render,
+    'turns': bench_turns
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time engine hot paths without opening a window.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, from: {0} (default: all)'.format(
+        ', '.join(sorted(BENCHMARKS))))
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark {0!r}'.format(name))
+
+    for name in args.names or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
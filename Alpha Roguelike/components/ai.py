@@ -1,25 +1,42 @@
 import tcod as libtcod
 
-from random import randint
-
+from fov_functions import in_fov
 from game_messages import Message
 
 
 
 class BasicMonster:
+    # The rest of the last A* path, where its goal stood and the room graph room the route runs from,
+    # kept by Entity.move_astar, and whether the monster is after a target it has lost sight of.
+    # Class-level defaults so monsters from older saves start without them
+    path = None
+    path_target = None
+    route_room = None
+    hunting = False
+
     def take_turn(self, target, fov_map, game_map, entities):
         results = []
 
         monster = self.owner
-        if libtcod.map_is_in_fov(fov_map, monster.x, monster.y):
+        if in_fov(fov_map, monster.x, monster.y):
+            # With hunting on, a monster that has seen the target keeps after it out of sight
+            self.hunting = game_map.monster_hunting
 
             if monster.distance_to(target) >= 2:
-                monster.move_astar(target, entities, game_map)
+                if game_map.monster_pathing == 'flow':
+                    monster.move_flow(target, entities, game_map, fov_map)
+                else:
+                    monster.move_astar(target, entities, game_map)
 
             elif target.fighter.hp > 0:
                 attack_results = monster.fighter.attack(target)
                 results.extend(attack_results)
 
+        elif self.hunting and game_map.is_hot(monster.x, monster.y) and monster.distance_to(target) >= 2:
+            # Out of sight, so always A*: a far target is routed to over the room graph. Hunters out in cold
+            # chunks wait until the player comes back near them
+            monster.move_astar(target, entities, game_map)
+
         return results
 
 class ConfusedMonster:
@@ -27,12 +44,12 @@ class ConfusedMonster:
         self.previous_ai = previous_ai
         self.number_of_turns = number_of_turns
 
-    def take_turns(self, target, fov_map, game_map, entities):
+    def take_turn(self, target, fov_map, game_map, entities):
         results = []
 
         if self.number_of_turns > 0:
-            random_x = self.owner.x + randint(0, 2) - 1
-            random_y = self.owner.y + randint(0, 2) - 1
+            random_x = self.owner.x + game_map.rng.ai.randint(0, 2) - 1
+            random_y = self.owner.y + game_map.rng.ai.randint(0, 2) - 1
 
             if random_x != self.owner.x and random_y != self.owner.y:
                 self.owner.move_towards(random_x, random_y, game_map, entities)
@@ -1,10 +1,24 @@
 import tcod as libtcod
 
+from entity_store import StoreField, attached_state, detached_state
+
 from game_messages import Message
 
+from slot_utils import Slotted
+
+
+class Fighter(Slotted):
+    __slots__ = ('store', 'index', 'owner', 'max_hp', '_hp', 'max_sp', 'sp', 'max_mp', 'mp', 'defense', 'power',
+                 'xp')
+
+    # Kept in the owner's EntityStore slot while the owner is in a store
+    STORED = ('hp',)
+
+    hp = StoreField()
 
-class Fighter:
     def __init__(self, hp, sp, mp, defense, power, xp=0):
+        self.store = None
+        self.index = None
         self.max_hp = hp
         self.hp = hp
         self.max_sp = sp
@@ -15,11 +29,21 @@ class Fighter:
         self.power = power
         self.xp = xp
 
-    def take_damage(self, amount):
-        results = []
+    def __getstate__(self):
+        return detached_state(self, self.STORED)
+
+    def __setstate__(self, state):
+        Slotted.__setstate__(self, attached_state(state, self.STORED))
 
+    def take_damage(self, amount):
         self.hp -= amount
 
+        return self.damage_results()
+
+    def damage_results(self):
+        # What taking damage reports once hp is down; EntityStore.damage lowers hp for many fighters at once
+        results = []
+
         if self.hp <= 0:
             results.append({'dead': self.owner, 'xp': self.xp})
 
@@ -2,8 +2,12 @@ import libtcodpy as libtcod
 
 from game_messages import Message
 
+from slot_utils import Slotted
+
+
+class Inventory(Slotted):
+    __slots__ = ('owner', 'capacity', 'items')
 
-class Inventory:
     def __init__(self, capacity):
         self.capacity = capacity
         self.items = []
@@ -1,4 +1,9 @@
-class Item:
+from slot_utils import Slotted
+
+
+class Item(Slotted):
+    __slots__ = ('owner', 'use_function', 'targeting', 'targeting_message', 'function_kwargs')
+
     def __init__(self, use_function=None, targeting=False, targeting_message=None, **kwargs):
         self.use_function = use_function
         self.targeting = targeting
@@ -1,5 +1,8 @@
+from slot_utils import Slotted
 
 
-class Stairs:
+class Stairs(Slotted):
+    __slots__ = ('owner', 'floor')
+
     def __init__(self, floor):
         self.floor = floor
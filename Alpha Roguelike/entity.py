@@ -1,16 +1,40 @@
-import tcod as libtcod
-
 import math
 
+from entity_store import (COMPONENTS, ComponentField, EntityStore, LayerField, PositionField, StoreField,
+                          attached_state, detached_state)
+
+from slot_utils import Slotted
+
+from map_objects.pathing import cached_path_usable, path_stats
+
 from render_function import RenderOrder
 
 
-class Entity:
+class Entity(Slotted):
     """
     A generic object to represent players, enemies, items, etc.
+    While in an EntityStore, the stored fields below are read from and written to the store's arrays
     """
+    __slots__ = ('store', 'index', '_x', '_y', 'char', 'color', 'name', '_blocks', '_render_order', '_fighter', '_ai',
+                 '_item', 'inventory', '_stairs', 'level')
+
+    STORED = ('x', 'y', 'blocks')
+
+    x = PositionField()
+    y = PositionField()
+    blocks = StoreField(bool)
+    render_order = LayerField()
+
+    fighter = ComponentField()
+    ai = ComponentField()
+    item = ComponentField()
+    stairs = ComponentField()
+
     def __init__(self, x, y, char, color, name, blocks=False, render_order=RenderOrder.CORPSE, fighter=None, ai=None,
-                 item=None, inventory=None, stairs= None):
+                 item=None, inventory=None, stairs= None, level=None):
+        # The EntityStore holding this entity and its slot there; None while in no store
+        self.store = None
+        self.index = None
         self.x = x
         self.y = y
         self.char = char
@@ -23,6 +47,7 @@ class Entity:
         self.item = item
         self.inventory = inventory
         self.stairs = stairs
+        self.level = level
 
         if self.fighter:
             self.fighter.owner = self
@@ -39,10 +64,29 @@ class Entity:
         if self.stairs:
             self.stairs.owner = self
 
+        if self.level:
+            self.level.owner = self
+
+    def __getstate__(self):
+        # The store is saved as a list of its entities, so each entity keeps its own copy of the stored fields
+        return detached_state(self, self.STORED)
+
+    def __setstate__(self, state):
+        Slotted.__setstate__(self, attached_state(state, self.STORED + ('render_order',) + COMPONENTS))
+
+    def place(self, x, y):
+        # Put the entity on (x, y), moving it in its store's tile index once rather than per coordinate
+        old_x, old_y = self.x, self.y
+
+        Entity.x.write(self, x)
+        Entity.y.write(self, y)
+
+        if self.store is not None:
+            self.store.moved(self, old_x, old_y)
+
     def move(self, dx, dy):
         # Move the entity by a given amount
-        self.x += dx
-        self.y += dy
+        self.place(self.x + dx, self.y + dy)
 
     def move_towards(self, target_x, target_y, game_map, entities):
         dx = target_x - self.x
@@ -55,6 +99,7 @@ class Entity:
         if not (game_map.is_blocked(self.x + dx, self.y + dy) or
                     get_blocking_entities_at_location(entities, self.x + dx, self.y + dy)):
             self.move(dx, dy)
+            game_map.entity_moved(self, self.x - dx, self.y - dy)
 
     def distance(self, x, y):
         return math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
@@ -64,51 +109,86 @@ class Entity:
         dy = other.y - self.y
         return math.sqrt(dx ** 2 + dy ** 2)
 
-    def move_astar(self, target, entities, game_map):
-        # Create a FOV map that has the dimensions of the map
-        fov = libtcod.map_new(game_map.width, game_map.height)
+    def move_flow(self, target, entities, game_map, fov_map):
+        # Step down the shared flow field towards the target, around the blocking entities on the walk map
+        flow_field = game_map.get_flow_field(fov_map, target.x, target.y)
+        step = flow_field.next_step(self.x, self.y, game_map.get_walk_map(entities).blockers)
+
+        if step:
+            old_x, old_y = self.x, self.y
+            self.place(*step)
 
-        # Scan the current map each turn and set all the walls as unwalkable
-        for y1 in range(game_map.height):
-            for x1 in range(game_map.width):
-                libtcod.map_set_properties(fov, x1, y1, not game_map.tiles[x1][y1].block_sight,
-                                           not game_map.tiles[x1][y1].blocked)
+            game_map.entity_moved(self, old_x, old_y)
+        else:
+            # Too far away, unreachable or boxed in: same backup as move_astar
+            self.move_towards(target.x, target.y, game_map, entities)
 
-        # Scan all the objects to see if there are objects that must be navigated around
-        # Check also that the object isn't self or the target (so that the start and the end points are free)
+    def move_astar(self, target, entities, game_map):
+        # The floor's shared walk map already has the walls and every blocking entity set as unwalkable,
+        # so there are objects that must be navigated around without copying the map
+        # The start and the end points (self and the target) are freed for the search itself
         # The AI class handles the situation if self is next to the target so it will not use this A* function anyway
-        for entity in entities:
-            if entity.blocks and entity != self and entity != target:
-                # Set the tile as a wall so it must be navigated around
-                libtcod.map_set_properties(fov, entity.x, entity.y, True, False)
-
-        # Allocate a A* path
-        # The 1.41 is the normal diagonal cost of moving, it can be set as 0.0 if diagonal moves are prohibited
-        my_path = libtcod.path_new_using_map(fov, 1.41)
-
-        # Compute the path between self's coordinates and the target's coordinates
-        libtcod.path_compute(my_path, self.x, self.y, target.x, target.y)
-
-        # Check if the path exists, and in this case, also the path is shorter than 25 tiles
-        # The path size matters if you want the monster to use alternative longer paths (for example through other rooms) if for example the player is in a corridor
-        # It makes sense to keep path size relatively low to keep the monsters from running around the map if there's an alternative path really far away
-        if not libtcod.path_is_empty(my_path) and libtcod.path_size(my_path) < 25:
-            # Find the next coordinates in the computed full path
-            x, y = libtcod.path_walk(my_path, True)
-            if x or y:
-                # Set self's coordinates to the next path tile
-                self.x = x
-                self.y = y
+        walk_map = game_map.get_walk_map(entities)
+
+        # Goals to search for, in order, and whether the 25 tile cap applies
+        # A target close enough for a capped path is searched for directly, as it always was, with move_towards
+        # as the backup when no such path exists (a blocked corridor); the room graph never sends a nearby
+        # chase the long way round
+        goals = []
+        if max(abs(target.x - self.x), abs(target.y - self.y)) < 25:
+            goals.append(((target.x, target.y), True))
+
+        # A target further off (in play, a monster hunting out of sight; see BasicMonster) is routed to
+        # over the room graph: towards the target's room, searching tile by tile only as far as the next
+        # room on the route. That way already follows the route, so it is not capped
+        elif game_map.room_graph:
+            self.ai.route_room, waypoint = game_map.room_graph.next_waypoint(self.x, self.y, target.x, target.y,
+                                                                             self.ai.route_room)
+            if waypoint:
+                goals.append((waypoint, False))
+
+        # Keep walking last turn's path while its goal is still wanted and nothing stepped onto it
+        if any(cached_path_usable(self, self.ai.path, self.ai.path_target, goal, target, walk_map.blockers)
+               for goal, capped in goals):
+            path_stats.reused += 1
+        else:
+            path_stats.recomputed += 1
+            self.ai.path = None
+
+            for goal, capped in goals:
+                # Compute the path between self's coordinates and the goal's coordinates
+                # The path has to exist and, when capped, be shorter than 25 tiles
+                # The path size matters if you want the monster to use alternative longer paths (for example through other rooms) if for example the player is in a corridor
+                # It makes sense to keep path size relatively low to keep the monsters from running around the map if there's an alternative path really far away
+                my_path = walk_map.compute_path(self.x, self.y, goal[0], goal[1], 25 if capped else None)
+
+                if my_path:
+                    # Keep the full list of steps, in floor coordinates
+                    self.ai.path = my_path
+                    self.ai.path_target = goal
+
+                    break
+
+        # A waypoint's tile is freed for the search even if something stands on it, so never step onto a blocker
+        if self.ai.path and self.ai.path[0] not in walk_map.blockers:
+            # Take the next coordinates in the path
+            old_x, old_y = self.x, self.y
+
+            # Set self's coordinates to the next path tile
+            self.place(*self.ai.path.pop(0))
+
+            game_map.entity_moved(self, old_x, old_y)
         else:
             # Keep the old move function as a backup so that if there are no paths (for example another monster blocks a corridor)
             # it will still try to move towards the player (closer to the corridor opening)
             self.move_towards(target.x, target.y, game_map, entities)
 
-            # Delete the path to free memory
-        libtcod.path_delete(my_path)
-
 
 def get_blocking_entities_at_location(entities, destination_x, destination_y):
+    # An EntityStore answers from its tile index; plain lists (floors built away from the game) are still scanned
+    if isinstance(entities, EntityStore):
+        return entities.blocking_at(destination_x, destination_y)
+
     for entity in entities:
         if entity.blocks and entity.x == destination_x and entity.y == destination_y:
             return entity
@@ -0,0 +1,443 @@
+import numpy as np
+
+from array import array
+from collections import Counter
+
+from slot_utils import Slotted
+
+
+# The per-entity values kept in the store's arrays, with their array typecodes and NumPy dtypes: the ones
+# some query reads as a whole array (area queries and blockers read x, y and blocks; damage writes hp).
+# Plain array.array reads back Python ints cheaply in the turn loop; NumPy views them for whole-array work
+FIELDS = {
+    'x': ('i', np.int32),
+    'y': ('i', np.int32),
+    'blocks': ('b', np.bool_),
+    'hp': ('i', np.int32),
+    # When the entity was appended, counting every append; orders entities the way the list does,
+    # since a slot can be reused by an entity appended later. -1 marks a free slot
+    'added': ('q', np.int64),
+}
+
+# The components the store keeps a live set of entities for
+COMPONENTS = ('fighter', 'ai', 'item', 'stairs')
+
+
+class StoreField:
+    """
+    An attribute held in the entity store's array of the same name while its object is in a store,
+    and in the object itself (in a slot named with a leading underscore) otherwise
+    """
+    def __init__(self, cast=None, to_array=None):
+        self.cast = cast
+        self.to_array = to_array
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.local = '_' + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        if obj.store is None:
+            return getattr(obj, self.local)
+
+        value = getattr(obj.store, self.name)[obj.index]
+
+        return self.cast(value) if self.cast else value
+
+    def __set__(self, obj, value):
+        self.write(obj, value)
+
+    def write(self, obj, value):
+        if obj.store is None:
+            setattr(obj, self.local, value)
+        else:
+            getattr(obj.store, self.name)[obj.index] = self.to_array(value) if self.to_array else value
+
+
+class PositionField(StoreField):
+    """
+    x or y of an entity: setting it also moves the entity in its store's tile index
+    """
+    def __set__(self, entity, value):
+        if entity.store is None:
+            self.write(entity, value)
+        else:
+            old_x, old_y = entity.x, entity.y
+            self.write(entity, value)
+
+            entity.store.moved(entity, old_x, old_y)
+
+
+class LayerField:
+    """
+    render_order of an entity, kept in the entity itself: setting it on an entity in a store
+    also moves the entity to its new layer there
+    """
+    def __set_name__(self, owner, name):
+        self.local = '_' + name
+
+    def __get__(self, entity, objtype=None):
+        if entity is None:
+            return self
+
+        return getattr(entity, self.local)
+
+    def __set__(self, entity, value):
+        if entity.store is None:
+            setattr(entity, self.local, value)
+        else:
+            entity.store.layers[getattr(entity, self.local).value].pop(entity)
+            setattr(entity, self.local, value)
+
+            entity.store.layers.setdefault(value.value, {})[entity] = None
+            entity.store.version += 1
+
+
+class ComponentField:
+    """
+    A component of an entity. Setting one on an entity in a store goes through the store,
+    which keeps its live set of entities with that component (and the fighter's stats) in step
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.local = '_' + name
+
+    def __get__(self, entity, objtype=None):
+        if entity is None:
+            return self
+
+        return getattr(entity, self.local)
+
+    def __set__(self, entity, component):
+        if entity.store is None:
+            self.write(entity, component)
+        else:
+            entity.store.set_component(entity, self.name, component)
+
+    def write(self, entity, component):
+        setattr(entity, self.local, component)
+
+
+def detached_state(obj, names):
+    # An object's slots with its stored fields copied out of the store, for pickling
+    state = Slotted.__getstate__(obj)
+
+    for name in names:
+        state['_' + name] = getattr(obj, name)
+
+    state['store'] = None
+    state['index'] = None
+
+    return state
+
+
+def reordering(name):
+    # A list method the store can't support: the list order is the order entities were added in
+    def method(self, *args, **kwargs):
+        raise TypeError('EntityStore does not support {0}: entities join at the end with append and leave '
+                        'with remove'.format(name))
+
+    method.__name__ = name
+
+    return method
+
+
+def attached_state(state, names):
+    # Rename the plain attributes of saves made before the fields were stored
+    for name in names:
+        if name in state:
+            state['_' + name] = state.pop(name)
+
+    state.setdefault('store', None)
+    state.setdefault('index', None)
+
+    return state
+
+
+class EntityStore(list):
+    """
+    The entities of a floor: the same list as before, plus an index of the entities standing on each tile.
+    Positions, blocks flags and fighter hp live in arrays, one slot per entity,
+    so area queries, blockers and damage can be done on whole arrays. Entities and fighters in the store
+    read and write their slot; entities report their moves, keeping the tile index in step.
+    It also keeps, per component, the entities that currently have one
+    """
+    def __init__(self, entities=()):
+        super().__init__()
+
+        self.by_tile = {}
+
+        # Dicts used as ordered sets, so the entities come out in the order they were added, like the list
+        self.with_component = {name: {} for name in COMPONENTS}
+
+        # The same per render order value, so drawing can pick a layer without sorting the floor
+        self.layers = {}
+
+        # Bumped by every addition, removal, move and component or layer change, for caches built on the store
+        self.version = 0
+
+        # slots[i] is the entity in slot i, or None for a free slot
+        self.slots = []
+        self.free = []
+        self.appended = 0
+
+        for name, (typecode, dtype) in FIELDS.items():
+            setattr(self, name, array(typecode))
+
+        self.extend(entities)
+
+    def __reduce__(self):
+        # Saved as a plain list of entities; the arrays and tile index are rebuilt on load
+        return self.__class__, (list(self),)
+
+    def append(self, entity):
+        super().append(entity)
+
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.slots)
+            self.slots.append(None)
+
+            for name in FIELDS:
+                getattr(self, name).append(0)
+
+        self.slots[slot] = entity
+        self.added[slot] = self.appended
+        self.appended += 1
+
+        self._attach(entity, slot, entity.STORED)
+        self.attach_fighter(entity)
+
+        for name, members in self.with_component.items():
+            if getattr(entity, name) is not None:
+                members[entity] = None
+
+        self.layers.setdefault(entity.render_order.value, {})[entity] = None
+        self.by_tile.setdefault((entity.x, entity.y), []).append(entity)
+        self.version += 1
+
+    def extend(self, entities):
+        for entity in entities:
+            self.append(entity)
+
+    def __iadd__(self, entities):
+        self.extend(entities)
+
+        return self
+
+    def remove(self, entity):
+        super().remove(entity)
+
+        self._unindex(entity, entity.x, entity.y)
+
+        for members in self.with_component.values():
+            members.pop(entity, None)
+
+        self.layers[entity.render_order.value].pop(entity)
+
+        slot = entity.index
+        self.detach_fighter(entity)
+        self._detach(entity, entity.STORED)
+
+        self.slots[slot] = None
+        self.added[slot] = -1
+        self.free.append(slot)
+        self.version += 1
+
+    def pop(self, position=-1):
+        entity = self[position]
+        self.remove(entity)
+
+        return entity
+
+    def __delitem__(self, position):
+        # A plain list of the entities at position, so removing them can't shift what is left to remove
+        doomed = self[position] if isinstance(position, slice) else [self[position]]
+
+        for entity in doomed:
+            self.remove(entity)
+
+    def clear(self):
+        for entity in list(self):
+            self.remove(entity)
+
+    # The other list methods that change the list would put it out of step with the tile index, the slots and
+    # the component sets, or reorder it
+    insert = reordering('insert')
+    __setitem__ = reordering('__setitem__')
+    __imul__ = reordering('__imul__')
+    sort = reordering('sort')
+    reverse = reordering('reverse')
+
+    def _view(self, name):
+        # A NumPy view of one field's array, for use within a single query. append raises BufferError
+        # while any view is alive, so none is kept or handed out past the query
+        return np.frombuffer(getattr(self, name), dtype=FIELDS[name][1])
+
+    def _live(self):
+        # Mask of the slots holding an entity
+        return self._view('added') >= 0
+
+    def _attach(self, obj, slot, names):
+        # Copy the object's stored fields into the slot; it reads and writes there from now on
+        values = [getattr(obj, name) for name in names]
+
+        obj.store = self
+        obj.index = slot
+
+        for name, value in zip(names, values):
+            getattr(type(obj), name).write(obj, value)
+
+    def _detach(self, obj, names):
+        # Copy the object's stored fields back out of its slot
+        values = [getattr(obj, name) for name in names]
+
+        obj.store = None
+        obj.index = None
+
+        for name, value in zip(names, values):
+            getattr(type(obj), name).write(obj, value)
+
+    def attach_fighter(self, entity):
+        fighter = entity.fighter
+
+        if fighter is not None:
+            self._attach(fighter, entity.index, fighter.STORED)
+
+    def detach_fighter(self, entity):
+        fighter = entity.fighter
+
+        if fighter is not None and fighter.store is self:
+            self._detach(fighter, fighter.STORED)
+
+    def set_component(self, entity, name, component):
+        if name == 'fighter':
+            self.detach_fighter(entity)
+
+        getattr(type(entity), name).write(entity, component)
+
+        if name == 'fighter':
+            self.attach_fighter(entity)
+
+        # Swapping one component for another (a confused AI and back) keeps the entity's place in the set
+        if component is None:
+            self.with_component[name].pop(entity, None)
+        else:
+            self.with_component[name][entity] = None
+
+        self.version += 1
+
+    def having(self, name):
+        # The entities that have the named component, in the order they were added
+        return self.with_component[name].keys()
+
+    def layer(self, render_order):
+        # The entities drawn at the given render order, in the order they joined it
+        return self.layers.get(render_order.value, {}).keys()
+
+    def moved(self, entity, old_x, old_y):
+        self._unindex(entity, old_x, old_y)
+        self.by_tile.setdefault((entity.x, entity.y), []).append(entity)
+        self.version += 1
+
+    def _unindex(self, entity, x, y):
+        here = self.by_tile[(x, y)]
+        here.remove(entity)
+
+        if not here:
+            del self.by_tile[(x, y)]
+
+    def list_order(self, entity):
+        # Sort key putting entities in their order in the list
+        return self.added[entity.index]
+
+    def at(self, x, y):
+        # Everything standing on (x, y), blocking or not. Don't add, remove or move entities while looping over it
+        return self.by_tile.get((x, y), ())
+
+    def in_view(self, visible, x0=0, y0=0):
+        # The entity lists of the tiles marked in visible (a bool array indexed [x, y] from the tile (x0, y0)),
+        # walking the marked tiles or the occupied ones, whichever there are fewer of
+        width, height = visible.shape
+
+        if np.count_nonzero(visible) <= len(self.by_tile):
+            for x, y in zip(*np.nonzero(visible)):
+                here = self.by_tile.get((int(x) + x0, int(y) + y0))
+
+                if here:
+                    yield here
+        else:
+            for (x, y), here in self.by_tile.items():
+                if 0 <= x - x0 < width and 0 <= y - y0 < height and visible[x - x0, y - y0]:
+                    yield here
+
+    def blocking_at(self, x, y):
+        for entity in self.at(x, y):
+            if entity.blocks:
+                return entity
+
+        return None
+
+    def blocker_counts(self):
+        # How many blocking entities stand on each tile, as a Counter keyed by (x, y), read off the arrays
+        blocking = np.flatnonzero(self._live() & self._view('blocks'))
+
+        return Counter(zip(self._view('x')[blocking].tolist(), self._view('y')[blocking].tolist()))
+
+    def _in_square(self, x, y, reach):
+        # Entities at most reach tiles from (x, y) along each axis. Walks the square's tiles in the tile index
+        # while there are fewer of those than occupied tiles; past that, tests every slot's position at once
+        if (2 * reach + 1) ** 2 <= len(self.by_tile):
+            return [entity for tile_x in range(x - reach, x + reach + 1) for tile_y in range(y - reach, y + reach + 1)
+                    for entity in self.by_tile.get((tile_x, tile_y), ())]
+
+        near = self._live() & (np.abs(self._view('x') - x) <= reach) & (np.abs(self._view('y') - y) <= reach)
+
+        return [self.slots[slot] for slot in np.flatnonzero(near).tolist()]
+
+    def within_radius(self, x, y, radius):
+        # Entities at most radius tiles from (x, y) in a straight line, the same test as Entity.distance,
+        # in their list order. A radius covering more tiles than are occupied is tested on the whole arrays
+        reach = int(radius)
+
+        if (2 * reach + 1) ** 2 <= len(self.by_tile):
+            return sorted((entity for entity in self._in_square(x, y, reach)
+                           if (entity.x - x) ** 2 + (entity.y - y) ** 2 <= radius * radius), key=self.list_order)
+
+        dx = self._view('x') - x
+        dy = self._view('y') - y
+        inside = np.flatnonzero(self._live() & (dx * dx + dy * dy <= radius * radius))
+        inside = inside[np.argsort(self._view('added')[inside])]
+
+        return [self.slots[slot] for slot in inside.tolist()]
+
+    def nearest(self, x, y, max_range, predicate=None, strict=False):
+        # The closest entity at most max_range tiles from (x, y) that passes predicate, or None;
+        # with strict, only entities closer than max_range count.
+        # Ties go to the entity that comes first in the list
+        best = None
+        best_key = None
+
+        for entity in self._in_square(x, y, int(max_range)):
+            distance_squared = (entity.x - x) ** 2 + (entity.y - y) ** 2
+
+            if distance_squared > max_range * max_range or (strict and distance_squared == max_range * max_range):
+                continue
+
+            if predicate and not predicate(entity):
+                continue
+
+            key = (distance_squared, self.added[entity.index])
+
+            if best_key is None or key < best_key:
+                best, best_key = entity, key
+
+        return best
+
+    def damage(self, entities, amount):
+        # Take amount off the hp of every given entity's fighter at once
+        self._view('hp')[[entity.index for entity in entities]] -= amount
@@ -1,14 +1,109 @@
 import tcod as libtcod
 
+import numpy as np
+
+from collections import OrderedDict
+
+
+class FovCache:
+    """
+    Bounded LRU of computed FOV results, keyed by everything recompute_fov depends on.
+    Each entry is the bit-packed visibility of the square around the viewer.
+    """
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        bits = self.entries.get(key)
+
+        if bits is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        return bits
+
+    def put(self, key, bits):
+        self.entries[key] = bits
+
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def fov_window(fov_map, x, y, radius):
+    # The [y, x] slices of the fov buffer that a viewer at (x, y), in the FOV map's coordinates, can possibly light
+    if radius <= 0:
+        return slice(0, fov_map.height), slice(0, fov_map.width)
+
+    # One extra tile for walls lit at the edge of the radius
+    reach = radius + 1
+
+    return (slice(max(y - reach, 0), min(y + reach + 1, fov_map.height)),
+            slice(max(x - reach, 0), min(x + reach + 1, fov_map.width)))
+
+
 def initialize_fov(game_map):
-    fov_map = libtcod.map_new(game_map.width, game_map.height)
+    # Covers the game map's hot window: the whole floor, or on a chunked floor the chunks around the player.
+    # fov_map.window is that (x, y, width, height); the map's own coordinates start at its (x, y)
+    x, y, width, height = game_map.hot_window()
 
-    for y in range(game_map.height):
-        for x in range(game_map.width):
-            libtcod.map_set_properties(fov_map, x, y, not game_map.tiles[x][y].block_sight, 
-                                        not game_map.tiles[x][y].blocked)
+    fov_map = libtcod.map_new(width, height)
+    fov_map.window = (x, y, width, height)
+
+    # The tcod buffers are indexed [y, x], the tile planes [x, y]
+    fov_map.transparent[...] = ~game_map.tiles['block_sight'][x:x + width, y:y + height].T
+    fov_map.walkable[...] = ~game_map.tiles['blocked'][x:x + width, y:y + height].T
 
     return fov_map
 
-def recompute_fov(fov_map, x, y, radius, light_walls=True, algorithm=0):
-    libtcod.map_compute_fov(fov_map, x, y, radius, light_walls, algorithm)
\ No newline at end of file
+
+def in_fov(fov_map, x, y):
+    # Whether the floor tile (x, y) is lit; tiles outside the FOV map's window never are
+    x -= fov_map.window[0]
+    y -= fov_map.window[1]
+
+    return 0 <= x < fov_map.width and 0 <= y < fov_map.height and libtcod.map_is_in_fov(fov_map, x, y)
+
+
+def visible_area(fov_map, x, y, width, height):
+    # Which tiles of the floor rectangle at (x, y) are lit, as a bool array indexed [x, y] from its corner
+    visible = np.zeros((width, height), dtype=np.bool_)
+
+    x0, y0, fov_width, fov_height = fov_map.window
+    x1, y1 = max(x, x0), max(y, y0)
+    x2, y2 = min(x + width, x0 + fov_width), min(y + height, y0 + fov_height)
+
+    if x1 < x2 and y1 < y2:
+        # fov_map.fov is indexed [y, x]; transpose to [x, y]
+        visible[x1 - x:x2 - x, y1 - y:y2 - y] = fov_map.fov[y1 - y0:y2 - y0, x1 - x0:x2 - x0].T
+
+    return visible
+
+
+def recompute_fov(fov_map, x, y, radius, light_walls=True, algorithm=0, cache=None, map_version=0):
+    # (x, y) is on the floor; the FOV map's own coordinates are offset by its window
+    key = (x, y, radius, light_walls, algorithm, map_version, fov_map.window)
+
+    x -= fov_map.window[0]
+    y -= fov_map.window[1]
+
+    if cache is None:
+        libtcod.map_compute_fov(fov_map, x, y, radius, light_walls, algorithm)
+        return
+
+    window = fov_window(fov_map, x, y, radius)
+    bits = cache.get(key)
+
+    if bits is None:
+        libtcod.map_compute_fov(fov_map, x, y, radius, light_walls, algorithm)
+        cache.put(key, np.packbits(fov_map.fov[window]))
+    else:
+        shape = fov_map.fov[window].shape
+
+        fov_map.fov[...] = False
+        fov_map.fov[window] = np.unpackbits(bits, count=shape[0] * shape[1]).reshape(shape)
@@ -2,8 +2,12 @@ import tcod as libtcod
 
 import textwrap
 
+from slot_utils import Slotted
+
+
+class Message(Slotted):
+    __slots__ = ('text', 'color')
 
-class Message:
     def __init__(self, text, color=libtcod.white):
         self.text = text
         self.color = color
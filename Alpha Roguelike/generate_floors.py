@@ -0,0 +1,122 @@
+import argparse
+import csv
+import json
+import os
+import time
+
+import tcod as libtcod
+
+from concurrent.futures import ProcessPoolExecutor
+
+from entity import Entity
+from loader_functions.initialize_new_game import get_constants
+from map_objects.game_map import GameMap
+from random_utils import new_seed
+from render_function import RenderOrder
+
+
+STAT_FIELDS = ['seed', 'dungeon_level', 'rooms', 'floor_area', 'monsters', 'items', 'generation_ms']
+
+
+def floor_stats(task):
+    """
+    Generate one floor without a window and describe it; runs inside a worker process
+    """
+    seed, dungeon_level, constants = task
+
+    start = time.perf_counter()
+
+    game_map = GameMap(constants['map_width'], constants['map_height'], dungeon_level, seed)
+    stand_in = Entity(0, 0, '@', libtcod.white, 'Player', blocks=True, render_order=RenderOrder.ACTOR)
+    entities = [stand_in]
+
+    game_map.make_map(constants['max_rooms'], constants['room_min_size'], constants['room_max_size'],
+                      constants['map_width'], constants['map_height'], stand_in, entities,
+                      constants['max_monsters_per_room'], constants['max_items_per_room'])
+
+    generation_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'seed': seed,
+        'dungeon_level': dungeon_level,
+        'rooms': len(game_map.room_graph.rooms),
+        'floor_area': int((~game_map.tiles['blocked']).sum()),
+        'monsters': sum(1 for entity in entities if entity.ai),
+        'items': sum(1 for entity in entities if entity.item),
+        'generation_ms': round(generation_ms, 3)
+    }
+
+
+class StatsWriter:
+    # Writes one row per floor as results arrive, as CSV or JSON lines depending on the extension
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.csv = None
+
+        if path.endswith('.csv'):
+            self.csv = csv.DictWriter(self.file, fieldnames=STAT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, stats):
+        if self.csv:
+            self.csv.writerow(stats)
+        else:
+            self.file.write(json.dumps(stats) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def parse_args():
+    constants = get_constants()
+
+    parser = argparse.ArgumentParser(description='Generate dungeon floors without a window and record their statistics.')
+    parser.add_argument('--floors', type=int, default=1000, help='number of floors to generate')
+    parser.add_argument('--output', default='floors.jsonl', help='.csv or .jsonl file for per-floor statistics')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None, help='first floor seed; floor i uses seed + i')
+    parser.add_argument('--dungeon-level', type=int, default=1)
+    parser.add_argument('--map-width', type=int, default=constants['map_width'])
+    parser.add_argument('--map-height', type=int, default=constants['map_height'])
+    parser.add_argument('--max-rooms', type=int, default=constants['max_rooms'])
+    parser.add_argument('--room-min-size', type=int, default=constants['room_min_size'])
+    parser.add_argument('--room-max-size', type=int, default=constants['room_max_size'])
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    constants = get_constants()
+    constants.update({
+        'map_width': args.map_width,
+        'map_height': args.map_height,
+        'max_rooms': args.max_rooms,
+        'room_min_size': args.room_min_size,
+        'room_max_size': args.room_max_size
+    })
+    # The colour table holds libtcod.Color objects the workers never need
+    del constants['colors']
+
+    first_seed = args.seed if args.seed is not None else new_seed()
+    tasks = [(first_seed + i, args.dungeon_level, constants) for i in range(args.floors)]
+
+    writer = StatsWriter(args.output)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        chunksize = max(1, args.floors // (args.workers * 16))
+
+        for stats in executor.map(floor_stats, tasks, chunksize=chunksize):
+            writer.write(stats)
+
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    print('Generated {0} floors in {1:.2f}s ({2:.1f} floors/s) with {3} workers, stats in {4}'.format(
+        args.floors, elapsed, args.floors / elapsed, args.workers, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,39 @@
 import tcod as libtcod
 
+import time
 
 from game_states import GameStates
 
 
+INPUT_EVENTS = libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE
+
+
+def wait_for_input(key, mouse, constants):
+    """
+    Fill key and mouse from the next input event; returns whether one arrived.
+    With wait_for_events this sleeps until there is input, or until animation_interval seconds have
+    passed when that is set. Otherwise it polls once. Either way, while polling for nothing it sleeps
+    one frame at frame_cap between polls instead of spinning
+    """
+    if constants['wait_for_events'] and constants['animation_interval'] is None:
+        libtcod.sys_wait_for_event(INPUT_EVENTS, key, mouse, False)
+
+        return True
+
+    timeout = constants['animation_interval'] if constants['wait_for_events'] else 0
+    frame = 1 / constants['frame_cap'] if constants['frame_cap'] else 0
+    deadline = time.perf_counter() + timeout
+
+    while True:
+        if libtcod.sys_check_for_event(INPUT_EVENTS, key, mouse):
+            return True
+
+        time.sleep(frame)
+
+        if time.perf_counter() >= deadline:
+            return False
+
+
 def handle_keys(key, game_state):
     if game_state == GameStates.PLAYERS_TURN:
         return handle_player_turn_keys(key)
@@ -1,5 +1,6 @@
 import tcod as libtcod
 
+from fov_functions import in_fov
 from game_messages import Message
 
 from components.ai import ConfusedMonster
@@ -27,16 +28,11 @@ def cast_lightning(*args, **kwargs):
 
     results = []
 
-    target = None
-    closest_distance = maximum_range + 1
-
-    for entity in entities:
-        if entity.fighter and entity != caster and libtcod.map_is_in_fov(fov_map, entity.x, entity.y):
-            distance = caster.distance_to(entity)
-
-            if distance < closest_distance:
-                target = entity
-                closest_distance = distance
+    # Only the entities around the caster are looked at, from the entity store's tile index.
+    # The bolt reaches anything closer than maximum_range + 1, as it always has
+    target = entities.nearest(caster.x, caster.y, maximum_range + 1,
+                              lambda entity: entity.fighter and entity != caster and
+                              in_fov(fov_map, entity.x, entity.y), strict=True)
 
     if target:
         results.append({'consumed': True, 'target': target, 'message': Message('A lighting bolt strikes the {0} with a loud thunder! The damage is {1}'.format(target.name, damage))})
@@ -56,16 +52,19 @@ def cast_fireball(*args, **kwargs):
 
     results = []
 
-    if not libtcod.map_is_in_fov(fov_map, target_x, target_y):
+    if not in_fov(fov_map, target_x, target_y):
         results.append({'consumed': False, 'message': Message('You cannot target a tile outside your field of view.', libtcod.yellow)})
         return results
 
     results.append({'consumed': True, 'message': Message('The fireball explodes, burning everything within {0} tiles!'.format(radius), libtcod.orange)})
 
-    for entity in entities:
-        if entity.distance(target_x, target_y) <= radius and entity.fighter:
-            results.append({'message': Message('The {0} gets burned for {1} hit points.'.format(entity.name, damage), libtcod.orange)})
-            results.extend(entity.fighter.take_damage(damage))
+    # Find the fighters in the blast from the entity store's tile index, and burn them all at once
+    burned = [entity for entity in entities.within_radius(target_x, target_y, radius) if entity.fighter]
+    entities.damage(burned, damage)
+
+    for entity in burned:
+        results.append({'message': Message('The {0} gets burned for {1} hit points.'.format(entity.name, damage), libtcod.orange)})
+        results.extend(entity.fighter.damage_results())
 
     return results
 
@@ -77,12 +76,12 @@ def cast_confuse(*args, **kwargs):
 
     results = []
 
-    if not libtcod.map_is_in_fov(fov_map, target_x, target_y):
+    if not in_fov(fov_map, target_x, target_y):
         results.append({'consumed': False, 'message': Message('You cannot target a tile outside your field of view.', libtcod.yellow)})
         return results
 
-    for entity in entities:
-        if entity.x == target_x and entity.y == target_y and entity.ai:
+    for entity in entities.at(target_x, target_y):
+        if entity.ai:
             confused_ai = ConfusedMonster(entity.ai, 10)
 
             confused_ai.owner = entity
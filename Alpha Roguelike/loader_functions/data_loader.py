@@ -2,6 +2,8 @@ import os
 
 import shelve
 
+from entity_store import EntityStore
+
 
 def save_game(player, entities, game_map, message_log, game_state):
     with shelve.open('savegame', 'n') as data_file:
@@ -23,6 +25,10 @@ def load_game():
         message_log = data_file['message_log']
         game_state = data_file['game_state']
 
+    # Saves from before the entity store hold a plain list
+    if not isinstance(entities, EntityStore):
+        entities = EntityStore(entities)
+
     player = entities[player_index]
 
     return player, entities, game_map, message_log, game_state
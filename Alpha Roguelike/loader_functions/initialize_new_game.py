@@ -6,6 +6,8 @@ from components.levels import Level
 
 from entity import Entity
 
+from entity_store import EntityStore
+
 from game_messages import MessageLog
 
 from game_states import GameStates
@@ -31,6 +33,9 @@ def get_constants():
 
     map_width = 80
     map_height = 43
+    # Set to e.g. 32 to store very large floors in lazily built chunks; the FOV and walk maps then only
+    # cover the chunks around the player
+    map_chunk_size = None
 
     room_max_size = 10
     room_min_size = 6
@@ -39,10 +44,28 @@ def get_constants():
     fov_algorithm = 0
     fov_light_walls = True
     fov_radius = 10
+    # Number of recent FOV results to keep for reuse, 0 to always recompute
+    fov_cache_size = 64
 
     max_monsters_per_room = 3
     max_items_per_room = 2
 
+    # 'astar' paths each monster on its own, 'flow' moves them all down one shared flow field (for hordes)
+    monster_pathing = 'astar'
+    # Set to True to have monsters that have seen the player keep hunting it out of sight; when it is far off
+    # they route to it room by room over the floor's room graph
+    monster_hunting = False
+
+    # None rolls a new run seed; set it to replay the same dungeon
+    seed = None
+
+    # Sleep until input arrives instead of polling every frame
+    wait_for_events = True
+    # Most frames drawn per second (and polls per second when not waiting), 0 for no cap
+    frame_cap = 30
+    # Seconds between frames while something animates; None when nothing does, so waiting can block
+    animation_interval = None
+
     colors = {
         'dark_wall': libtcod.Color(0, 0, 100),
         'dark_ground': libtcod.Color(50, 50, 150),
@@ -62,14 +85,22 @@ def get_constants():
         'message_height': message_height,
         'map_width': map_width,
         'map_height': map_height,
+        'map_chunk_size': map_chunk_size,
         'room_max_size': room_max_size,
         'room_min_size': room_min_size,
         'max_rooms': max_rooms,
         'fov_algorithm': fov_algorithm,
         'fov_light_walls': fov_light_walls,
         'fov_radius': fov_radius,
+        'fov_cache_size': fov_cache_size,
         'max_monsters_per_room': max_monsters_per_room,
         'max_items_per_room': max_items_per_room,
+        'monster_pathing': monster_pathing,
+        'monster_hunting': monster_hunting,
+        'seed': seed,
+        'wait_for_events': wait_for_events,
+        'frame_cap': frame_cap,
+        'animation_interval': animation_interval,
         'colors': colors
     }
 
@@ -81,9 +112,13 @@ def get_game_variables(constants):
     level_component = Level()
     player = Entity(0, 0, '@', libtcod.white, 'Player', blocks=True, render_order=RenderOrder.ACTOR,
                     fighter=fighter_component, inventory=inventory_component, level=level_component)
-    entities = [player]
+    entities = EntityStore([player])
+
+    game_map = GameMap(constants['map_width'], constants['map_height'], seed=constants['seed'],
+                       chunk_size=constants['map_chunk_size'])
+    game_map.monster_pathing = constants['monster_pathing']
+    game_map.monster_hunting = constants['monster_hunting']
 
-    game_map = GameMap(constants['map_width'], constants['map_height'])
     game_map.make_map(constants['max_rooms'], constants['room_min_size'], constants['room_max_size'],
                       constants['map_width'], constants['map_height'], player, entities,
                       constants['max_monsters_per_room'], constants['max_items_per_room'])
@@ -0,0 +1,143 @@
+import numpy as np
+import zlib
+
+from map_objects.tile import new_tiles, tile_dt
+
+
+def _span(index, size):
+    # An int or slice along one axis as (start, stop, is_scalar)
+    if isinstance(index, slice):
+        start, stop, step = index.indices(size)
+        if step != 1:
+            raise IndexError('Chunked tiles only support contiguous slices')
+        return start, max(start, stop), False
+
+    index = int(index)
+    if index < 0:
+        index += size
+    if not 0 <= index < size:
+        raise IndexError('Tile index {0} is outside the map'.format(index))
+
+    return index, index + 1, True
+
+
+class ChunkedField:
+    """
+    One plane of a ChunkedTiles, indexed [x, y] with ints or slices like a plane of the dense array
+    """
+    def __init__(self, tiles, field):
+        self.tiles = tiles
+        self.field = field
+
+    def __getitem__(self, key):
+        x_index, y_index = key
+        x1, x2, x_scalar = _span(x_index, self.tiles.width)
+        y1, y2, y_scalar = _span(y_index, self.tiles.height)
+
+        if x_scalar and y_scalar:
+            size = self.tiles.chunk_size
+            chunk = self.tiles.chunk(x1 // size, y1 // size)
+
+            if chunk is None:
+                return self.tiles.default[self.field]
+
+            return chunk[self.field][x1 % size, y1 % size]
+
+        out = np.full((x2 - x1, y2 - y1), self.tiles.default[self.field])
+
+        for chunk, (sx, sy), (dx, dy) in self.tiles.overlapping(x1, y1, x2, y2):
+            out[dx, dy] = chunk[self.field][sx, sy]
+
+        if x_scalar:
+            return out[0]
+        if y_scalar:
+            return out[:, 0]
+        return out
+
+    def __setitem__(self, key, value):
+        x_index, y_index = key
+        x1, x2, x_scalar = _span(x_index, self.tiles.width)
+        y1, y2, y_scalar = _span(y_index, self.tiles.height)
+
+        value = np.broadcast_to(np.asarray(value), (x2 - x1, y2 - y1))
+
+        for chunk, (sx, sy), (dx, dy) in self.tiles.overlapping(x1, y1, x2, y2, create=True):
+            chunk[self.field][sx, sy] = value[dx, dy]
+
+
+class ChunkedTiles:
+    """
+    Tile storage for very large floors, split into chunk_size x chunk_size blocks.
+    A chunk is only allocated the first time something writes to it; until then it reads as solid wall.
+    Chunks more than hot_radius chunks away from the player are kept zlib-compressed until touched again.
+    """
+    def __init__(self, width, height, chunk_size=32, hot_radius=2):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.hot_radius = hot_radius
+
+        self.default = new_tiles(1, 1)[0, 0]
+        self.chunks = {}
+        self.compressed = {}
+
+    @property
+    def shape(self):
+        return self.width, self.height
+
+    def __getitem__(self, field):
+        return ChunkedField(self, field)
+
+    def chunk(self, cx, cy, create=False):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+
+        if chunk is None:
+            data = self.compressed.pop(key, None)
+
+            if data is not None:
+                chunk = self._decompress(data)
+                self.chunks[key] = chunk
+            elif create:
+                chunk = new_tiles(self.chunk_size, self.chunk_size)
+                self.chunks[key] = chunk
+
+        return chunk
+
+    def overlapping(self, x1, y1, x2, y2, create=False):
+        """
+        For each chunk under [x1, x2) x [y1, y2): the chunk, the slices inside it and the matching
+        slices relative to (x1, y1). Unbuilt chunks are skipped unless create is set.
+        """
+        size = self.chunk_size
+
+        if x1 >= x2 or y1 >= y2:
+            return
+
+        for cx in range(x1 // size, (x2 - 1) // size + 1):
+            for cy in range(y1 // size, (y2 - 1) // size + 1):
+                chunk = self.chunk(cx, cy, create)
+
+                if chunk is None:
+                    continue
+
+                cx0 = cx * size
+                cy0 = cy * size
+                ax1, ax2 = max(x1, cx0), min(x2, cx0 + size)
+                ay1, ay2 = max(y1, cy0), min(y2, cy0 + size)
+
+                yield (chunk, (slice(ax1 - cx0, ax2 - cx0), slice(ay1 - cy0, ay2 - cy0)),
+                       (slice(ax1 - x1, ax2 - x1), slice(ay1 - y1, ay2 - y1)))
+
+    def compress_far(self, x, y):
+        # Pack every hot chunk further than hot_radius chunks from (x, y)
+        px = x // self.chunk_size
+        py = y // self.chunk_size
+
+        for (cx, cy) in list(self.chunks):
+            if max(abs(cx - px), abs(cy - py)) > self.hot_radius:
+                self.compressed[(cx, cy)] = zlib.compress(self.chunks.pop((cx, cy)).tobytes())
+
+    def _decompress(self, data):
+        return np.frombuffer(zlib.decompress(data), dtype=tile_dt).reshape(
+            self.chunk_size, self.chunk_size).copy()
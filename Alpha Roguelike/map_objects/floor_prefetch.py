@@ -0,0 +1,69 @@
+import tcod as libtcod
+
+from concurrent.futures import ThreadPoolExecutor
+
+from entity import Entity
+from map_objects.game_map import GameMap
+from render_function import RenderOrder
+
+
+def generate_floor(seed, dungeon_level, constants):
+    """
+    Build a whole floor away from the live game, returning (tiles, room graph, entities, player start)
+    in the form GameMap.next_floor takes as its floor argument
+    """
+    game_map = GameMap(constants['map_width'], constants['map_height'], dungeon_level, seed,
+                       constants['map_chunk_size'])
+
+    # make_map only moves the player, so a stand-in records where the real one will start
+    stand_in = Entity(0, 0, '@', libtcod.white, 'Player', blocks=True, render_order=RenderOrder.ACTOR)
+    entities = [stand_in]
+
+    game_map.make_map(constants['max_rooms'], constants['room_min_size'], constants['room_max_size'],
+                      constants['map_width'], constants['map_height'], stand_in, entities,
+                      constants['max_monsters_per_room'], constants['max_items_per_room'])
+
+    return game_map.tiles, game_map.room_graph, entities[1:], (stand_in.x, stand_in.y)
+
+
+class FloorPrefetcher:
+    """
+    Generates the floor below the current one on a worker thread while the player explores
+    """
+    def __init__(self, constants):
+        self.constants = constants
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.seed = None
+        self.dungeon_level = None
+        self.future = None
+
+    def start(self, game_map):
+        self.cancel()
+
+        # Seeded from the current floor, so the result is the same floor next_floor would build
+        self.seed = game_map.seed
+        self.dungeon_level = game_map.dungeon_level + 1
+        self.future = self.executor.submit(generate_floor, self.seed, self.dungeon_level, self.constants)
+
+    def take(self, game_map):
+        future = self.future
+        self.future = None
+
+        seed = game_map.seed
+        dungeon_level = game_map.dungeon_level + 1
+
+        # Nothing usable was queued, or the worker never picked it up: build it here instead
+        if future is None or (self.seed, self.dungeon_level) != (seed, dungeon_level) or future.cancel():
+            return generate_floor(seed, dungeon_level, self.constants)
+
+        # Already running or finished, so waiting is never slower than starting over
+        return future.result()
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
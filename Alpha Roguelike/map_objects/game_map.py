@@ -5,32 +5,132 @@ from components.fighter import Fighter
 from components.item import Item
 from components.stairs import Stairs
 from entity import Entity
+from entity_store import EntityStore
 from game_messages import Message
 from item_functions import cast_fireball, cast_confuse, cast_lightning, heal
 from render_function import RenderOrder
-from map_objects.tile import Tile
-from map_objects.rectangle import Rect
-from random_utils import from_dungeon_level, random_choice_from_dict
-from random import randint
+from map_objects.tile import new_tiles
+from map_objects.chunked_tiles import ChunkedTiles
+from map_objects.occupancy import OccupancyGrid
+from map_objects.pathing import FlowField, WalkMap
+from map_objects.rectangle import Rect, RectIndex
+from map_objects.room_graph import RoomGraph
+from random_utils import RngStreams, from_dungeon_level, new_seed, random_choice_from_dict
 
 class GameMap:
-    def __init__(self, width, height, dungeon_level=1):
+    def __init__(self, width, height, dungeon_level=1, seed=None, chunk_size=None):
         self.width = width
         self.height = height
+        # With a chunk size the tiles live in lazily built chunks instead of one dense array
+        self.chunk_size = chunk_size
         self.tiles = self.initialize_tiles()
+        # Where update_chunks last kept the chunks hot, which is what the FOV and walk maps cover
+        self.focus = None
+        # Bumped whenever blocked/block_sight change, so caches of derived data know to drop out
+        self.version = 0
 
         self.dungeon_level = dungeon_level
 
-    def initialize_tiles(self):
-        tiles = [[Tile(True) for y in range(self.height)] for x in range(self.width)]
+        # Every floor of a run is derived from this one seed, see random_utils.RngStreams
+        if seed is None:
+            seed = new_seed()
+
+        self.seed = seed
+        self.rng = RngStreams(self.seed, self.dungeon_level)
+
+        self.room_graph = None
 
+        # 'astar' gives each monster its own path, 'flow' shares one flow field towards the player
+        self.monster_pathing = 'astar'
+        # Whether monsters keep after the player once it is out of sight
+        self.monster_hunting = False
+        self.walk_map = None
+        self.flow_field = None
+
+    def initialize_tiles(self):
+        if self.chunk_size:
+            tiles = ChunkedTiles(self.width, self.height, self.chunk_size)
+        else:
+            tiles = new_tiles(self.width, self.height)
 
         return tiles
 
+    def hot_window(self):
+        # (x, y, width, height) of the part of the floor the FOV and walk maps are built over: on a chunked
+        # floor the hot chunks around the focus, so their size doesn't grow with the floor; otherwise all of it
+        if not self.chunk_size or self.focus is None:
+            return 0, 0, self.width, self.height
+
+        size = self.chunk_size
+        reach = self.tiles.hot_radius
+        chunk_x, chunk_y = self.focus[0] // size, self.focus[1] // size
+
+        x1 = max((chunk_x - reach) * size, 0)
+        y1 = max((chunk_y - reach) * size, 0)
+        x2 = min((chunk_x + reach + 1) * size, self.width)
+        y2 = min((chunk_y + reach + 1) * size, self.height)
+
+        return x1, y1, x2 - x1, y2 - y1
+
+    def is_hot(self, x, y):
+        # Whether (x, y) is in the hot window, the part of the floor the FOV and walk maps reach
+        x1, y1, width, height = self.hot_window()
+
+        return x1 <= x < x1 + width and y1 <= y < y1 + height
+
+    def update_chunks(self, x, y):
+        # Compress the chunks far from (x, y), the player's position; dense maps have nothing to do
+        self.focus = (x, y)
+
+        if self.chunk_size:
+            self.tiles.compress_far(x, y)
+
+    def __getstate__(self):
+        # The walk map and flow field wrap tcod objects and are rebuilt on demand, so they are not saved
+        state = self.__dict__.copy()
+        state['walk_map'] = None
+        state['flow_field'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        # Saves made before the array-backed tiles stored a list-of-lists of Tile objects
+        tiles = state.get('tiles')
+
+        if isinstance(tiles, list):
+            state['tiles'] = new_tiles(state['width'], state['height'])
+
+            for x, column in enumerate(tiles):
+                for y, tile in enumerate(column):
+                    state['tiles'][x, y] = (tile.blocked, tile.block_sight, tile.explored)
+
+        # Saves made before seeded generation have no seed, so give them a fresh one
+        if 'seed' not in state:
+            state['seed'] = new_seed()
+            state['rng'] = RngStreams(state['seed'], state['dungeon_level'])
+
+        state.setdefault('room_graph', None)
+        state.setdefault('chunk_size', None)
+        state.setdefault('focus', None)
+        state.setdefault('version', 0)
+        state.setdefault('monster_pathing', 'astar')
+        state.setdefault('monster_hunting', False)
+        state.setdefault('walk_map', None)
+        state.setdefault('flow_field', None)
+
+        self.__dict__.update(state)
+
 
     def make_map(self, max_rooms, room_min_size, room_max_size, map_width, map_height, player, entities,
                  max_monsters_per_room, max_items_per_room):
+        # Restart the streams so the same (seed, dungeon_level) always carves the same floor
+        self.rng = RngStreams(self.seed, self.dungeon_level)
+        randint = self.rng.layout.randint
+
         rooms = []
+        room_index = RectIndex(map_width, map_height)
+        room_graph = RoomGraph()
+        occupancy = OccupancyGrid(self.width, self.height, entities)
         num_rooms = 0
 
         center_of_last_room_x = None
@@ -47,15 +147,12 @@ class GameMap:
             #'Rect' class makes rectangles easier to work with
             new_room = Rect(x, y, w, h)
 
-            #run through other rooms and check if they interact with new_room
-            for other_room in rooms:
-                if new_room.intersect(other_room):
-                    break
-
-            else:
-                #if loop did not break, i.e. there were no intersections
+            #check new_room against the cells already covered by other rooms
+            if not room_index.intersects_any(new_room):
+                #there were no intersections
                 #paint it to the map's tiles
                 self.create_room(new_room)
+                room_graph.add_room(new_room)
 
                 #center coordinates of new room
                 (new_x, new_y) = new_room.center()
@@ -65,8 +162,7 @@ class GameMap:
 
                 if num_rooms == 0:
                     # this is the first room, where the player starts at
-                    player.x = new_x
-                    player.y = new_y
+                    occupancy.move(player, new_x, new_y)
                 else:
                     #all rooms after the first:
                     #connect it to the previous room with a tunnel
@@ -77,46 +173,63 @@ class GameMap:
                     #flip a coin (0, 1)
                     if randint(0, 1) == 1:
                         #first move horizontally, then vertically
-                        self.create_h_tunnel(prev_x, new_x, prev_y)
-                        self.create_v_tunnel(prev_y, new_y, new_x)
+                        tunnels = [self.create_h_tunnel(prev_x, new_x, prev_y),
+                                   self.create_v_tunnel(prev_y, new_y, new_x)]
                     else:
                         #first move vertically, then horizontally
-                        self.create_v_tunnel(prev_y, new_y, prev_x)
-                        self.create_h_tunnel(prev_x, new_x, new_y)
+                        tunnels = [self.create_v_tunnel(prev_y, new_y, prev_x),
+                                   self.create_h_tunnel(prev_x, new_x, new_y)]
 
-                self.place_entities(new_room, entities, max_monsters_per_room, max_items_per_room)
+                    #remember which rooms the tunnel joins, for routing monsters across the floor
+                    room_graph.connect(num_rooms - 1, num_rooms, tunnels)
+
+                self.place_entities(new_room, entities, occupancy)
 
                 #finally, append the new room to the list
                 rooms.append(new_room)
+                room_index.add(new_room)
                 num_rooms += 1
 
+        self.room_graph = room_graph
+
         stairs_component = Stairs(self.dungeon_level + 1)
         down_stairs = Entity(center_of_last_room_x, center_of_last_room_y, '>', libtcod.white, 'Stairs',
                              render_order=RenderOrder.STAIRS, stairs=stairs_component)
         entities.append(down_stairs)
 
+    def carve(self, x_slice, y_slice):
+        #make every tile in the slice passable in one assignment per plane
+        self.tiles['blocked'][x_slice, y_slice] = False
+        self.tiles['block_sight'][x_slice, y_slice] = False
+
+        self.version += 1
+
     def create_room(self, room):
-        #go through the tiles in the rectangle and make them passable
-        for x in range(room.x1 + 1, room.x2):
-            for y in range(room.y1 + 1, room.y2):
-                self.tiles[x][y].blocked = False
-                self.tiles[x][y].block_sight = False
+        #the inside of the rectangle, leaving its border as wall
+        self.carve(slice(room.x1 + 1, room.x2), slice(room.y1 + 1, room.y2))
 
     #create tunnels to go between rooms 
     def create_h_tunnel(self, x1, x2, y):
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.tiles[x][y].blocked = False
-            self.tiles[x][y].block_sight = False
+        tunnel = (slice(min(x1, x2), max(x1, x2) + 1), y)
+        self.carve(*tunnel)
+
+        return tunnel
 
     def create_v_tunnel(self, y1, y2, x):
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.tiles[x][y].blocked = False
-            self.tiles[x][y].block_sight = False
+        tunnel = (x, slice(min(y1, y2), max(y1, y2) + 1))
+        self.carve(*tunnel)
+
+        return tunnel
+
+    def place_entities(self, room, entities, occupancy=None):
+        if occupancy is None:
+            occupancy = OccupancyGrid(self.width, self.height, entities)
 
-    def place_entities(self, room, entities):
         max_monsters_per_room = from_dungeon_level([[2, 1], [3, 4], [5, 6]], self.dungeon_level)
         max_items_per_room = from_dungeon_level([[1, 1], [2, 4]], self.dungeon_level)
 
+        randint = self.rng.spawns.randint
+
         # Get a random number of monsters
         number_of_monsters = randint(0, max_monsters_per_room)
         number_of_items = randint(0, max_items_per_room)
@@ -125,7 +238,7 @@ class GameMap:
         'orc':350, 
         'uruk': 100, 
         'infirnimp':49, 
-        'dragon': from_dungeon_level([100,10], self.dungeon_level)}
+        'dragon': from_dungeon_level([[100, 10]], self.dungeon_level)}
 
         item_chances = {'healing_potion': 70, 
         'lightning_scroll': 10, 
@@ -138,8 +251,8 @@ class GameMap:
             y = randint(room.y1 + 1, room.y2 - 1)
 
 
-            if not any([entity for entity in entities if entity.x == x and entity.y == y]):
-                monster_choice = random_choice_from_dict(monster_chances)
+            if occupancy.is_free(x, y):
+                monster_choice = random_choice_from_dict(monster_chances, self.rng.spawns)
 
                 #monster generation %
                 if monster_choice == 'goblin':
@@ -174,13 +287,14 @@ class GameMap:
                                     render_order=RenderOrder.ACTOR, fighter=fighter_component, ai=ai_component)
 
                 entities.append(monster)
+                occupancy.add(monster)
 
         for i in range(number_of_items):
             x = randint(room.x1 + 1, room.x2 - 1)
             y = randint(room.y1 + 1, room.y2 - 1)
 
-            if not any([entity for entity in entities if entity.x == x and entity.y == y]):
-                item_choice = random_choice_from_dict(item_chances)
+            if occupancy.is_free(x, y):
+                item_choice = random_choice_from_dict(item_chances, self.rng.spawns)
                 
                 if item_choice == 'healing_potion':
                     #spawns healing potion at 70%
@@ -210,21 +324,54 @@ class GameMap:
                                   item=item_component)
 
                 entities.append(item)
+                occupancy.add(item)
+
+    def get_walk_map(self, entities):
+        # The shared A* map for this floor, rebuilt only after the tiles change or the hot window moves
+        if (self.walk_map is None or self.walk_map.version != self.version or
+                self.walk_map.map.window != self.hot_window()):
+            self.walk_map = WalkMap(self, entities)
+
+        return self.walk_map
+
+    def get_flow_field(self, fov_map, target_x, target_y):
+        # One Dijkstra pass per target position; a new FOV map (new floor) starts a new field
+        if self.flow_field is None or self.flow_field.fov_map is not fov_map:
+            self.flow_field = FlowField(fov_map)
+
+        self.flow_field.compute(target_x, target_y)
+
+        return self.flow_field
+
+    def entity_moved(self, entity, old_x, old_y):
+        # Keep the walk map's blocker marks in step with a blocking entity that just moved
+        if self.walk_map is not None and entity.blocks:
+            self.walk_map.move_blocker(old_x, old_y, entity.x, entity.y)
 
     def is_blocked(self, x, y):
-        if self.tiles[x][y].blocked:
+        if self.tiles['blocked'][x, y]:
             return True
 
         return False
 
-    def next_floor(self, player, message_log, constants):
+    def next_floor(self, player, message_log, constants, floor=None):
         self.dungeon_level += 1
-        entities = [player]
-
-        self.tiles = self.initialize_tiles()
-        self.make_map(constants['max_rooms'], constants['room_min_size'], constants['room_max_size'],
-                      constants['map_width'], constants['map_height'], player, entities,
-                      constants['max_monsters_per_room'], constants['max_items_per_room'])
+        self.version += 1
+        entities = EntityStore([player])
+
+        if floor is None:
+            self.tiles = self.initialize_tiles()
+            self.make_map(constants['max_rooms'], constants['room_min_size'], constants['room_max_size'],
+                          constants['map_width'], constants['map_height'], player, entities,
+                          constants['max_monsters_per_room'], constants['max_items_per_room'])
+        else:
+            # Swap in a floor built ahead of time by a FloorPrefetcher
+            self.tiles, self.room_graph, floor_entities, (player.x, player.y) = floor
+            entities.extend(floor_entities)
+
+            self.rng = RngStreams(self.seed, self.dungeon_level)
+
+        self.update_chunks(player.x, player.y)
 
         message_log.add_message(Message('You travel to the next floor.', libtcod.light_violet))
 
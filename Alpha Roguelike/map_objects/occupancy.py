@@ -0,0 +1,26 @@
+import numpy as np
+
+
+class OccupancyGrid:
+    """
+    Number of entities standing on each tile, kept in step with the entity list while a floor is built
+    """
+    def __init__(self, width, height, entities=()):
+        self.counts = np.zeros((width, height), dtype=np.uint16)
+
+        for entity in entities:
+            self.add(entity)
+
+    def add(self, entity):
+        self.counts[entity.x, entity.y] += 1
+
+    def move(self, entity, x, y):
+        self.counts[entity.x, entity.y] -= 1
+
+        entity.x = x
+        entity.y = y
+
+        self.counts[x, y] += 1
+
+    def is_free(self, x, y):
+        return not self.counts[x, y]
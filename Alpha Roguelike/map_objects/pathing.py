@@ -0,0 +1,182 @@
+import tcod as libtcod
+
+import numpy as np
+
+from fov_functions import initialize_fov
+
+
+# Stand-in for move_astar's 25-step path cap: monsters further than this (in diagonal-weighted
+# tiles) from their target fall back to move_towards instead of following the flow field
+MAX_FLOW_DISTANCE = 25
+
+NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+# How far (in tiles) a target may wander from where a monster's cached path was aimed before it is recomputed
+PATH_TARGET_SLACK = 1
+
+
+class PathStats:
+    # How often move_astar walked a cached path versus running a new search
+    def __init__(self):
+        self.reused = 0
+        self.recomputed = 0
+
+
+path_stats = PathStats()
+
+
+def cached_path_usable(entity, path, path_target, goal, target, blockers):
+    """
+    A path kept from an earlier turn is still good if it starts next to the entity, the goal (the target,
+    or a room graph waypoint) has not moved far from where it was aimed, and no blocking entity other
+    than the target stands on it
+    """
+    if not path or path_target is None:
+        return False
+
+    next_x, next_y = path[0]
+    if max(abs(next_x - entity.x), abs(next_y - entity.y)) != 1:
+        return False
+
+    if max(abs(goal[0] - path_target[0]), abs(goal[1] - path_target[1])) > PATH_TARGET_SLACK:
+        return False
+
+    return not any(step in blockers and step != (target.x, target.y) for step in path)
+
+
+class WalkMap:
+    """
+    The walkability map monsters run A* on, built once per floor (and, on a chunked floor, again whenever
+    the player's hot window moves; it only covers that window). Walls come from the tiles; blocking entities
+    are marked on top and moved as they move, so a path query never has to copy the map.
+    Everything here takes and returns floor coordinates; blockers holds every blocking entity on the floor.
+    """
+    def __init__(self, game_map, entities):
+        self.version = game_map.version
+        self.map = initialize_fov(game_map)
+        self.x, self.y, self.width, self.height = self.map.window
+        # Walkability of the bare floor, [y, x] like the tcod buffers
+        self.terrain = self.map.walkable.copy()
+        self.blockers = {}
+
+        # The 1.41 is the normal diagonal cost of moving, it can be set as 0.0 if diagonal moves are prohibited
+        self.path = libtcod.path_new_using_map(self.map, 1.41)
+
+        self.sync(entities)
+
+    def sync(self, entities):
+        # Re-mark every blocking entity, found from the entity store's arrays; only touches the tiles
+        # of old and new blockers
+        xs, ys = self._inside(self.blockers)
+        self.map.walkable[ys, xs] = self.terrain[ys, xs]
+
+        self.blockers = entities.blocker_counts()
+
+        xs, ys = self._inside(self.blockers)
+        self.map.walkable[ys, xs] = False
+
+    def move_blocker(self, old_x, old_y, x, y):
+        count = self.blockers.get((old_x, old_y), 0)
+
+        if count > 1:
+            self.blockers[(old_x, old_y)] = count - 1
+        elif count == 1:
+            del self.blockers[(old_x, old_y)]
+
+            if self._covers(old_x, old_y):
+                self.map.walkable[old_y - self.y, old_x - self.x] = self.terrain[old_y - self.y, old_x - self.x]
+
+        self.blockers[(x, y)] = self.blockers.get((x, y), 0) + 1
+
+        if self._covers(x, y):
+            self.map.walkable[y - self.y, x - self.x] = False
+
+    def compute_path(self, ox, oy, dx, dy, max_size=None):
+        # The steps from (ox, oy) to (dx, dy), or None if there is no path (or none shorter than max_size)
+        # inside the window
+        if not (self._covers(ox, oy) and self._covers(dx, dy)):
+            return None
+
+        ox, oy, dx, dy = ox - self.x, oy - self.y, dx - self.x, dy - self.y
+
+        # The start and end points hold the mover and its target, so open them up for the search
+        walkable = self.map.walkable
+        saved = walkable[oy, ox], walkable[dy, dx]
+        walkable[oy, ox] = self.terrain[oy, ox]
+        walkable[dy, dx] = self.terrain[dy, dx]
+
+        libtcod.path_compute(self.path, ox, oy, dx, dy)
+
+        walkable[oy, ox], walkable[dy, dx] = saved
+
+        size = libtcod.path_size(self.path)
+
+        if libtcod.path_is_empty(self.path) or (max_size is not None and size >= max_size):
+            return None
+
+        steps = [libtcod.path_get(self.path, i) for i in range(size)]
+
+        return [(x + self.x, y + self.y) for x, y in steps]
+
+    def _covers(self, x, y):
+        return 0 <= x - self.x < self.width and 0 <= y - self.y < self.height
+
+    def _inside(self, tiles):
+        # The window's own x and y coordinates of the given floor tiles that lie in it, as arrays for fancy indexing
+        if not tiles:
+            return [], []
+
+        xs, ys = np.array(list(tiles)).T
+        xs, ys = xs - self.x, ys - self.y
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+
+        return xs[inside], ys[inside]
+
+
+class FlowField:
+    """
+    Dijkstra distances from one target over the bare floor, computed once and shared by every
+    monster chasing it; each monster then just steps to its lowest free neighbour
+    """
+    def __init__(self, fov_map):
+        self.fov_map = fov_map
+        self.dijkstra = libtcod.dijkstra_new(fov_map, 1.41)
+        self.root = None
+
+        # Floor coordinates in, the FOV map's own coordinates for tcod
+        self.x, self.y, self.width, self.height = fov_map.window
+
+    def compute(self, x, y):
+        # Only redone when the target has moved since the last monster asked
+        if self.root != (x, y):
+            libtcod.dijkstra_compute(self.dijkstra, x - self.x, y - self.y)
+            self.root = (x, y)
+
+    def distance(self, x, y):
+        # -1 when the tile can't reach the target, or is outside the FOV map
+        if not (0 <= x - self.x < self.width and 0 <= y - self.y < self.height):
+            return -1
+
+        return libtcod.dijkstra_get_distance(self.dijkstra, x - self.x, y - self.y)
+
+    def next_step(self, x, y, blockers):
+        # The free neighbour closest to the target, or None if nothing gets closer
+        best = None
+        best_distance = self.distance(x, y)
+
+        if best_distance < 0 or best_distance > MAX_FLOW_DISTANCE:
+            return None
+
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+
+            if (nx, ny) in blockers:
+                continue
+
+            distance = self.distance(nx, ny)
+
+            if 0 <= distance < best_distance:
+                best = (nx, ny)
+                best_distance = distance
+
+        return best
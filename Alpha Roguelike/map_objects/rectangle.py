@@ -1,4 +1,11 @@
-class Rect:
+import numpy as np
+
+from slot_utils import Slotted
+
+
+class Rect(Slotted):
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
     def __init__(self, x, y, w, h):
         self.x1 = x
         self.y1 = y
@@ -13,4 +20,24 @@ class Rect:
     def intersect(self, other):
         #returns true if this rectangle intersects with another one
         return (self.x1 <= other.x2 and self.x2 >= other.x1 and 
-                self.y1 <= other.y2 and self.y2 >= other.y1)
\ No newline at end of file
+                self.y1 <= other.y2 and self.y2 >= other.y1)
+
+
+class RectIndex:
+    """
+    Occupancy grid of the cells covered by placed rectangles (borders included),
+    so an overlap test costs the area of the candidate instead of the number of rooms
+    """
+    def __init__(self, width, height):
+        self.occupied = np.zeros((width, height), dtype=np.bool_)
+
+    def _cells(self, rect):
+        #Rect.intersect treats x2/y2 as inclusive, so cover them too
+        return slice(max(rect.x1, 0), rect.x2 + 1), slice(max(rect.y1, 0), rect.y2 + 1)
+
+    def add(self, rect):
+        self.occupied[self._cells(rect)] = True
+
+    def intersects_any(self, rect):
+        #same answer as calling rect.intersect() against every added rectangle
+        return bool(self.occupied[self._cells(rect)].any())
@@ -0,0 +1,151 @@
+from collections import deque
+
+
+# Side of the square buckets of tiles an AreaIndex files its areas under
+AREA_BUCKET_SIZE = 16
+
+
+class AreaIndex:
+    """
+    Finds which of a set of numbered rectangles covers a tile. Each rectangle is filed under the square
+    buckets of tiles it touches, so the index takes memory per rectangle, not per tile of the floor
+    """
+    def __init__(self):
+        self.buckets = {}
+
+    def add(self, number, x_slice, y_slice):
+        # x_slice and y_slice are slices or single coordinates, as make_map carves them
+        x1, x2 = as_range(x_slice)
+        y1, y2 = as_range(y_slice)
+        area = (x1, x2, y1, y2, number)
+
+        for bucket_x in range(x1 // AREA_BUCKET_SIZE, (x2 - 1) // AREA_BUCKET_SIZE + 1):
+            for bucket_y in range(y1 // AREA_BUCKET_SIZE, (y2 - 1) // AREA_BUCKET_SIZE + 1):
+                self.buckets.setdefault((bucket_x, bucket_y), []).append(area)
+
+    def at(self, x, y):
+        # The highest number covering (x, y), the one added last where rectangles overlap; -1 for none
+        found = -1
+
+        for x1, x2, y1, y2, number in self.buckets.get((x // AREA_BUCKET_SIZE, y // AREA_BUCKET_SIZE), ()):
+            if x1 <= x < x2 and y1 <= y < y2 and number > found:
+                found = number
+
+        return found
+
+
+def as_range(coordinates):
+    # (start, stop) of a slice or of a single coordinate
+    if isinstance(coordinates, slice):
+        return coordinates.start, coordinates.stop
+
+    return coordinates, coordinates + 1
+
+
+class RoomGraph:
+    """
+    The rooms of a floor and the tunnels make_map dug between them.
+    Lets a monster far from its target route room by room, leaving tile-level search
+    to the stretch inside its current room or corridor.
+    """
+    def __init__(self):
+        self.rooms = []
+        self.links = []
+        self.corridors = []
+
+        # Which room's inside, or which corridor (as its carved slices), covers a tile
+        self.room_areas = AreaIndex()
+        self.corridor_areas = AreaIndex()
+
+        # Hop counts to a goal room, by goal room, filled in as monsters ask
+        self.hops = {}
+
+    def room_at(self, x, y):
+        # The room whose inside (x, y) is in, or -1
+        return self.room_areas.at(x, y)
+
+    def corridor_at(self, x, y):
+        # The corridor (x, y) was carved for, the later one where two cross, or -1
+        return self.corridor_areas.at(x, y)
+
+    def add_room(self, room):
+        index = len(self.rooms)
+
+        self.rooms.append(room)
+        self.links.append([])
+        self.room_areas.add(index, slice(room.x1 + 1, room.x2), slice(room.y1 + 1, room.y2))
+
+        return index
+
+    def connect(self, a, b, tunnels):
+        # tunnels: the (x_slice, y_slice) areas carved to join room a to room b
+        index = len(self.corridors)
+
+        self.corridors.append((a, b))
+        self.links[a].append(b)
+        self.links[b].append(a)
+
+        for x_slice, y_slice in tunnels:
+            self.corridor_areas.add(index, x_slice, y_slice)
+
+        self.hops = {}
+
+    def hops_to(self, goal):
+        # Breadth-first hop counts from every room to the goal room
+        if goal not in self.hops:
+            distances = {goal: 0}
+            frontier = deque([goal])
+
+            while frontier:
+                room = frontier.popleft()
+
+                for other in self.links[room]:
+                    if other not in distances:
+                        distances[other] = distances[room] + 1
+                        frontier.append(other)
+
+            self.hops[goal] = distances
+
+        return self.hops[goal]
+
+    def next_waypoint(self, x, y, target_x, target_y, route_room=None):
+        """
+        Returns (route_room, waypoint): the room the route is being planned from, and the centre of the
+        next room on the way to the target's room. The waypoint is None when tile-level search should go
+        straight for the target (already in its room, or either end outside the graph).
+
+        route_room is what the caller got back last time. It only moves on to the room the mover stands
+        in when that room is closer to the goal, so tunnels that cut through other rooms can't send the
+        mover back and forth.
+        """
+        goal = self.room_at(target_x, target_y)
+
+        if goal < 0:
+            return route_room, None
+
+        distances = self.hops_to(goal)
+        here = self.room_at(x, y)
+
+        if here >= 0 and here in distances and (route_room not in distances or
+                                                distances[here] < distances[route_room]):
+            route_room = here
+
+        if route_room in distances:
+            candidates = self.links[route_room]
+        else:
+            corridor = self.corridor_at(x, y)
+
+            if corridor < 0:
+                return route_room, None
+
+            candidates = self.corridors[corridor]
+
+        if route_room == goal or here == goal:
+            return route_room, None
+
+        reachable = [room for room in candidates if room in distances]
+
+        if not reachable:
+            return route_room, None
+
+        return route_room, self.rooms[min(reachable, key=distances.get)].center()
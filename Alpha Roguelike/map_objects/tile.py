@@ -1,7 +1,22 @@
-class Tile:
+import numpy as np
+
+from slot_utils import Slotted
+
+
+# Structured dtype backing GameMap.tiles, one boolean plane per Tile attribute
+tile_dt = np.dtype([
+    ('blocked', np.bool_),
+    ('block_sight', np.bool_),
+    ('explored', np.bool_),
+])
+
+
+class Tile(Slotted):
     """
     A tile on a map. May or may not be blocked, may or may not block sight
     """
+    __slots__ = ('blocked', 'block_sight', 'explored')
+
     def __init__(self, blocked, block_sight = None):
         self.blocked = blocked
 
@@ -12,3 +27,14 @@ class Tile:
         self.block_sight = block_sight
         
         self.explored = False
+
+
+def new_tiles(width, height, blocked=True):
+    """
+    Allocate a (width, height) tile array, indexed [x, y] like the old list-of-lists
+    """
+    tiles = np.zeros((width, height), dtype=tile_dt)
+    tiles['blocked'] = blocked
+    tiles['block_sight'] = blocked
+
+    return tiles
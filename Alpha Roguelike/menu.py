@@ -2,7 +2,7 @@ import tcod as libtcod
 
 
 
-def menu(con, header, options, width, screen_width, screen_height):
+def menu(con, header, options, width, screen_width, screen_height, root=0):
     if len(options) > 26: raise ValueError('Cannot have a menu with more than 26 options.')
 
     # calculate total height for the header (after auto-wrap) and one line per option
@@ -28,38 +28,43 @@ def menu(con, header, options, width, screen_width, screen_height):
     # blit the contents of "window" to the root console
     x = int(screen_width / 2 - width / 2)
     y = int(screen_height / 2 - height / 2)
-    libtcod.console_blit(window, 0, 0, width, height, 0, x, y, 1.0, 0.7)
+    libtcod.console_blit(window, 0, 0, width, height, root, x, y, 1.0, 0.7)
 
-def inventory_menu(con, header, inventory, inventory_width, screen_width, screen_height):
+def inventory_menu(con, header, inventory, inventory_width, screen_width, screen_height, root=0):
     # show a menu with each item of the inventory as an option
     if len(inventory.items) == 0:
         options = ['Inventory is empty.']
     else:
         options = [item.name for item in inventory.items]
 
-    menu(con, header, options, inventory_width, screen_width, screen_height)
+    menu(con, header, options, inventory_width, screen_width, screen_height, root)
 
-def main_menu(con, background_image, screen_width, screen_height):
-    libtcod.image_blit_2x(background_image, 0, 0, 0)
+def main_menu(con, background_image, screen_width, screen_height, root=0):
+    # The background needs the image file, which only the window loads; without it, start from a blank screen
+    if background_image is not None:
+        libtcod.image_blit_2x(background_image, root, 0, 0)
+    else:
+        libtcod.console_clear(root)
 
-    libtcod.console_set_default_foreground(0, libtcod.light_yellow)
-    libtcod.console_print_ex(0, int(screen_width / 2), int(screen_height / 2) - 4, libtcod.BKGND_NONE, libtcod.CENTER,
-                             'Basic Dungeon')
-    libtcod.console_print_ex(0, int(screen_width / 2), int(screen_height - 2), libtcod.BKGND_NONE, libtcod.CENTER,
-                             'By (Fried Ice)')
+    libtcod.console_set_default_foreground(root, libtcod.light_yellow)
+    libtcod.console_print_ex(root, int(screen_width / 2), int(screen_height / 2) - 4, libtcod.BKGND_NONE,
+                             libtcod.CENTER, 'Basic Dungeon')
+    libtcod.console_print_ex(root, int(screen_width / 2), int(screen_height - 2), libtcod.BKGND_NONE,
+                             libtcod.CENTER, 'By (Fried Ice)')
 
-    menu(con, '', ['Play a new game', 'Continue last game', 'Save game', 'Quit'], 24, screen_width, screen_height)
+    menu(con, '', ['Play a new game', 'Continue last game', 'Save game', 'Quit'], 24, screen_width, screen_height,
+         root)
 
-def level_up_menu(con, header, player, menu_width, screen_width, screen_height):
+def level_up_menu(con, header, player, menu_width, screen_width, screen_height, root=0):
     options = ['Constitution (+20 HP, from {0})'.format(player.fighter.max_hp),
                'Strength (+1 attack, from {0})'.format(player.fighter.power),
                'Agility (+1 defense, from {0})'.format(player.fighter.defense),
                'Stamina (+1 SP, from {0})'.format(player.fighter.max_sp),
-               'Willpower (+1 MP, from {0})'.format.fighter.max_mp]
+               'Willpower (+1 MP, from {0})'.format(player.fighter.max_mp)]
 
-    menu(con, header, options, menu_width, screen_width, screen_height)
+    menu(con, header, options, menu_width, screen_width, screen_height, root)
 
-def character_screen(player, character_screen_width, character_screen_height, screen_width, screen_height):
+def character_screen(player, character_screen_width, character_screen_height, screen_width, screen_height, root=0):
     window = libtcod.console_new(character_screen_width, character_screen_height)
 
     libtcod.console_set_default_foreground(window, libtcod.white)
@@ -85,8 +90,8 @@ def character_screen(player, character_screen_width, character_screen_height, sc
 
     x = screen_width // 2 - character_screen_width // 2
     y = screen_height // 2 - character_screen_height // 2
-    libtcod.console_blit(window, 0, 0, character_screen_width, character_screen_height, 0, x, y, 1.0, 0.7)
+    libtcod.console_blit(window, 0, 0, character_screen_width, character_screen_height, root, x, y, 1.0, 0.7)
 
 
-def message_box(con, header, width, screen_width, screen_height):
-    menu(con, header, [], width, screen_width, screen_height)
+def message_box(con, header, width, screen_width, screen_height, root=0):
+    menu(con, header, [], width, screen_width, screen_height, root)
@@ -1,4 +1,29 @@
-from random import randint
+import random
+
+
+def new_seed():
+    return random.getrandbits(64)
+
+
+def floor_rng(seed, dungeon_level, stream):
+    # String seeds are hashed with SHA-512, so a stream is the same in every process and run
+    return random.Random('{0}:{1}:{2}'.format(seed, dungeon_level, stream))
+
+
+class RngStreams:
+    """
+    The random.Random streams of one floor, all derived from the run seed and dungeon level.
+    Each subsystem has its own stream, so extra AI rolls never shift the layout or spawns
+    """
+    def __init__(self, seed, dungeon_level):
+        self.seed = seed
+        self.dungeon_level = dungeon_level
+
+        self.layout = floor_rng(seed, dungeon_level, 'layout')
+        self.spawns = floor_rng(seed, dungeon_level, 'spawns')
+        self.combat = floor_rng(seed, dungeon_level, 'combat')
+        self.ai = floor_rng(seed, dungeon_level, 'ai')
+
 
 def from_dungeon_level(table, dungeon_level):
     for (value, level) in reversed(table):
@@ -7,8 +32,8 @@ def from_dungeon_level(table, dungeon_level):
 
     return 0
 
-def random_choice_index(chances):
-    random_chance = randint(1, sum(chances))
+def random_choice_index(chances, rng=random):
+    random_chance = rng.randint(1, sum(chances))
 
     running_sum = 0
     choice = 0
@@ -20,8 +45,8 @@ def random_choice_index(chances):
         choice += 1
 
 
-def random_choice_from_dict(choice_dict):
+def random_choice_from_dict(choice_dict, rng=random):
     choices = list(choice_dict.keys())
     chances = list(choice_dict.values())
 
-    return choices[random_choice_index(chances)]
+    return choices[random_choice_index(chances, rng)]
@@ -1,7 +1,10 @@
 import tcod as libtcod
 
+import numpy as np
+
 from enum import Enum, auto
 
+from fov_functions import in_fov, visible_area
 from game_states import GameStates
 
 from menu import character_screen, inventory_menu, level_up_menu
@@ -12,11 +15,32 @@ class RenderOrder(Enum):
     ITEM = auto()
     ACTOR = auto()
 
-def get_names_under_mouse(mouse, entities, fov_map):
-    (x, y) = (mouse.cx, mouse.cy)
+def get_names_under_mouse(mouse, entities, fov_map, render_cache=None, origin=(0, 0), view_height=None):
+    # The mouse is over a console cell; origin is the floor tile shown in the console's top-left corner.
+    # Rows from view_height down are under the panel, which hides the map
+    if view_height is not None and mouse.cy >= view_height:
+        return ''
+
+    (x, y) = (mouse.cx + origin[0], mouse.cy + origin[1])
+
+    if render_cache is not None:
+        # The names only change when the mouse cell, the entities or the FOV do; on a change, only the
+        # entities on the hovered tile are looked at
+        key = (x, y, entities.version, render_cache.fov_version)
+
+        if key != render_cache.hover_key:
+            # Only ask the FOV map about a tile with something on it, which is always on the map.
+            # Listed in the entities' list order, like the full scan
+            here = sorted(entities.at(x, y), key=entities.list_order)
+            names = [entity.name for entity in here] if here and in_fov(fov_map, x, y) else []
+
+            render_cache.hover_key = key
+            render_cache.hover_names = ', '.join(names).capitalize()
+
+        return render_cache.hover_names
 
     names = [entity.name for entity in entities
-             if entity.x == x and entity.y == y and libtcod.map_is_in_fov(fov_map, entity.x, entity.y)]
+             if entity.x == x and entity.y == y and in_fov(fov_map, entity.x, entity.y)]
     names = ', '.join(names)
 
     return names.capitalize()
@@ -35,35 +59,108 @@ def render_bar(panel, x, y, total_width, name, value, maximum, bar_color, back_c
     libtcod.console_print_ex(panel, int(x + total_width / 2), y, libtcod.BKGND_NONE, libtcod.CENTER,
                              '{0}: {1}/{2}'.format(name, value, maximum))
 
+class RenderCache:
+    """
+    What render_map last painted on the map console: the visibility of each cell and the map version.
+    While the map is unchanged, only cells whose visibility changed need repainting; the rest are
+    still on the off-screen console from before
+    """
+    def __init__(self):
+        self.visible = None
+        self.map_version = None
+        self.origin = None
+
+        # Cells render_all drew an entity on, for clear_all to erase
+        self.drawn = []
+
+        # Counts FOV recomputes; the hover names are kept with the
+        # (mouse cell, entity store version, FOV version) they were worked out for
+        self.fov_version = 0
+        self.hover_key = None
+        self.hover_names = ''
+
+    def reset(self):
+        # Forget what was painted, e.g. after the console was cleared
+        self.visible = None
+
+
+def viewport_origin(player, game_map, width, height):
+    # The floor tile shown in the top-left corner of a width x height console: on a floor bigger than
+    # the console the view follows the player, stopping at the floor's edges
+    x = min(max(player.x - width // 2, 0), max(game_map.width - width, 0))
+    y = min(max(player.y - height // 2, 0), max(game_map.height - height, 0))
+
+    return x, y
+
+
+def render_map(con, game_map, fov_map, colors, width, height, cache=None, origin=(0, 0)):
+    # Only the part that fits on the console, from origin on, read from the tile storage as one block
+    x0, y0 = origin
+    width = min(game_map.width - x0, width)
+    height = min(game_map.height - y0, height)
+    block_sight = game_map.tiles['block_sight'][x0:x0 + width, y0:y0 + height]
+    old_explored = game_map.tiles['explored'][x0:x0 + width, y0:y0 + height]
+
+    visible = visible_area(fov_map, x0, y0, width, height)
+
+    if (cache is None or cache.visible is None or cache.map_version != game_map.version or
+            cache.visible.shape != visible.shape or cache.origin != origin):
+        # Nothing usable on the console yet: paint every cell, blanking what isn't explored
+        dirty = np.ones(visible.shape, dtype=np.bool_)
+        con.bg[:height, :width] = 0
+    else:
+        dirty = visible != cache.visible
+
+    # Whatever is in view is explored from now on
+    explored = old_explored | visible
+
+    # Palette row per cell: dark ground, dark wall, light ground, light wall
+    palette = np.array([colors.get('dark_ground'), colors.get('dark_wall'), colors.get('light_ground'),
+                        colors.get('light_wall')], dtype=np.uint8)
+    shade = visible * 2 + block_sight
+
+    # Unexplored cells are never painted. con.bg is indexed [y, x]; transpose to [x, y] to match the tiles
+    paint = dirty & explored
+    con.bg[:height, :width].transpose(1, 0, 2)[paint] = palette[shade[paint]]
+
+    # Only the box around the cells that just came into view is written back, so on a chunked floor
+    # solid rock away from them never gets chunks built for it
+    newly_explored = explored & ~old_explored
+
+    if newly_explored.any():
+        xs, ys = np.nonzero(newly_explored)
+        x1, x2, y1, y2 = xs.min(), xs.max() + 1, ys.min(), ys.max() + 1
+
+        game_map.tiles['explored'][x0 + x1:x0 + x2, y0 + y1:y0 + y2] = explored[x1:x2, y1:y2]
+
+    if cache is not None:
+        cache.visible = visible
+        cache.map_version = game_map.version
+        cache.origin = origin
+
+
 def render_all(con, panel, entities, player, game_map, fov_map, fov_recompute, message_log, screen_width, screen_height,
-               bar_width, panel_height, panel_y, mouse, colors, game_state):
-    if fov_recompute:
-    # Draw all the tiles in the game map
-        for y in range(game_map.height):
-            for x in range(game_map.width):
-                visible = libtcod.map_is_in_fov(fov_map, x, y)
-                wall = game_map.tiles[x][y].block_sight
+               bar_width, panel_height, panel_y, mouse, colors, game_state, render_cache=None, root=0):
+    # The map shows in the rows above the panel, so the view is panel_y rows tall
+    origin = viewport_origin(player, game_map, screen_width, panel_y)
 
-                if visible:
-                    if wall:
-                        libtcod.console_set_char_background(con, x, y, colors.get('light_wall'), libtcod.BKGND_SET)
-                    else:
-                        libtcod.console_set_char_background(con, x, y, colors.get('light_ground'), libtcod.BKGND_SET)
+    if fov_recompute:
+        # Draw the tiles of the game map; with a render cache, only the cells whose visibility changed
+        render_map(con, game_map, fov_map, colors, screen_width, panel_y, render_cache, origin)
 
-                    game_map.tiles[x][y].explored = True
-                elif game_map.tiles[x][y].explored:
-                    if wall:
-                        libtcod.console_set_char_background(con, x, y, colors.get('dark_wall'), libtcod.BKGND_SET)
-                    else:
-                        libtcod.console_set_char_background(con, x, y, colors.get('dark_ground'), libtcod.BKGND_SET)
+        if render_cache is not None:
+            render_cache.fov_version += 1
 
-    entities_in_render_order = sorted(entities, key=lambda x: x.render_order.value)
+    if render_cache is None:
+        entities_in_render_order = sorted(entities, key=lambda x: x.render_order.value)
 
-    # Draw all entities in the list
-    for entity in entities_in_render_order:
-        draw_entity(con, entity, fov_map, game_map)
+        # Draw all entities in the list
+        for entity in entities_in_render_order:
+            draw_entity(con, entity, fov_map, game_map, origin)
+    else:
+        render_cache.drawn = draw_entities(con, entities, fov_map, game_map, screen_width, panel_y, origin)
 
-    libtcod.console_blit(con, 0, 0, screen_width, screen_height, 0, 0, 0)
+    libtcod.console_blit(con, 0, 0, screen_width, screen_height, root, 0, 0)
 
     libtcod.console_set_default_background(panel, libtcod.black)
     libtcod.console_clear(panel)
@@ -89,9 +186,9 @@ def render_all(con, panel, entities, player, game_map, fov_map, fov_recompute, m
 
     libtcod.console_set_default_foreground(panel, libtcod.light_gray)
     libtcod.console_print_ex(panel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT,
-                             get_names_under_mouse(mouse, entities, fov_map))
+                             get_names_under_mouse(mouse, entities, fov_map, render_cache, origin, panel_y))
 
-    libtcod.console_blit(panel, 0, 0, screen_width, panel_height, 0, 0, panel_y)
+    libtcod.console_blit(panel, 0, 0, screen_width, panel_height, root, 0, panel_y)
 
     if game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
         if game_state == GameStates.SHOW_INVENTORY:
@@ -99,24 +196,68 @@ def render_all(con, panel, entities, player, game_map, fov_map, fov_recompute, m
         else:
             inventory_title = 'Press the key next to an item to drop it, or Esc to cancel.\n'
 
-        inventory_menu(con, inventory_title, player.inventory, 50, screen_width, screen_height)
+        inventory_menu(con, inventory_title, player.inventory, 50, screen_width, screen_height, root)
 
     elif game_state == GameStates.LEVEL_UP:
-        level_up_menu(con, 'Level up! Choose a stat to raise:', player, 40, screen_width, screen_height)
+        level_up_menu(con, 'Level up! Choose a stat to raise:', player, 40, screen_width, screen_height, root)
 
     elif game_state == GameStates.CHARACTER_SCREEN:
-        character_screen(player, 30, 10, screen_width, screen_height)
+        character_screen(player, 30, 10, screen_width, screen_height, root)
         
-def clear_all(con, entities):
-    for entity in entities:
-        clear_entity(con, entity)
+def draw_entities(con, entities, fov_map, game_map, width, height, origin=(0, 0)):
+    """
+    Draw only what can be seen: the stairs layer where explored, and on each tile in view the entity that
+    would end up on top of the tile's stack. Returns the console cells drawn on
+    """
+    drawn = []
+
+    x0, y0 = origin
+    width = min(game_map.width - x0, width)
+    height = min(game_map.height - y0, height)
 
-def draw_entity(con, entity, fov_map, game_map):
-    if libtcod.map_is_in_fov(fov_map, entity.x, entity.y) or (entity.stairs and game_map.tiles[entity.x][entity.y].explored):
+    for entity in entities.layer(RenderOrder.STAIRS):
+        if 0 <= entity.x - x0 < width and 0 <= entity.y - y0 < height:
+            draw_entity(con, entity, fov_map, game_map, origin)
+            drawn.append((entity.x - x0, entity.y - y0))
+
+    for here in entities.in_view(visible_area(fov_map, x0, y0, width, height), x0, y0):
+        # Later in the stack wins a tie, as with the stable sort of the whole list
+        top = here[0]
+        for entity in here[1:]:
+            if entity.render_order.value >= top.render_order.value:
+                top = entity
+
+        draw_entity(con, top, fov_map, game_map, origin)
+        drawn.append((top.x - x0, top.y - y0))
+
+    return drawn
+
+def clear_all(con, entities, render_cache=None, origin=(0, 0)):
+    if render_cache is None:
+        for entity in entities:
+            clear_entity(con, entity, origin)
+    else:
+        # Only the cells the last render_all drew on have anything to erase
+        for x, y in render_cache.drawn:
+            libtcod.console_put_char(con, x, y, ' ', libtcod.BKGND_NONE)
+
+        render_cache.drawn = []
+
+def draw_entity(con, entity, fov_map, game_map, origin=(0, 0)):
+    # Entities off the console (the view follows the player on big floors) are skipped
+    x, y = entity.x - origin[0], entity.y - origin[1]
+
+    if not (0 <= x < con.width and 0 <= y < con.height):
+        return
+
+    if in_fov(fov_map, entity.x, entity.y) or (entity.stairs and game_map.tiles['explored'][entity.x, entity.y]):
         libtcod.console_set_default_foreground(con, entity.color)
-        libtcod.console_put_char(con, entity.x, entity.y, entity.char, libtcod.BKGND_NONE)
+        libtcod.console_put_char(con, x, y, entity.char, libtcod.BKGND_NONE)
 
 
-def clear_entity(con, entity):
+def clear_entity(con, entity, origin=(0, 0)):
     # erase the character that represents this object
-    libtcod.console_put_char(con, entity.x, entity.y, ' ', libtcod.BKGND_NONE)
+    x, y = entity.x - origin[0], entity.y - origin[1]
+
+    if 0 <= x < con.width and 0 <= y < con.height:
+        libtcod.console_put_char(con, x, y, ' ', libtcod.BKGND_NONE)
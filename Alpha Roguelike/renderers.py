@@ -0,0 +1,126 @@
+import tcod as libtcod
+
+from input_handler import wait_for_input
+
+
+class TcodRenderer:
+    """
+    The game window: the libtcod root console, drawn with the arial12x12 font and read for keyboard and mouse input
+    """
+    draws = True
+
+    def __init__(self, constants):
+        libtcod.console_set_custom_font('arial12x12.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+
+        libtcod.console_init_root(constants['screen_width'], constants['screen_height'], constants['window_title'],
+                                  False)
+        libtcod.sys_set_fps(constants['frame_cap'])
+
+        # Console 0 is the root console in the libtcod API
+        self.root = 0
+
+    def is_closed(self):
+        return libtcod.console_is_window_closed()
+
+    def present(self):
+        libtcod.console_flush()
+
+    def wait_for_input(self, key, mouse, constants):
+        return wait_for_input(key, mouse, constants)
+
+    def toggle_fullscreen(self):
+        libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())
+
+
+def scripted_key(key, name):
+    # Fill key from one scripted key name: a single character ('g', 'a'), or a libtcod key name such as
+    # 'up', 'kp7', 'enter' or 'escape'
+    key.lalt = key.lctrl = key.ralt = key.rctrl = key.shift = False
+    key.pressed = True
+
+    if len(name) == 1:
+        key.vk = libtcod.KEY_CHAR
+        key.c = ord(name)
+    else:
+        key.vk = getattr(libtcod, 'KEY_' + name.upper())
+        key.c = 0
+
+
+class OffscreenRenderer:
+    """
+    Draws every frame into an off-screen console the size of the window, with no window, font or display.
+    Input comes from a script of key names (see scripted_key), one per wait; once it runs out the renderer
+    reports itself closed, so the game loops end the way they do when the window is closed.
+    The last frame can be dumped as text or, given the font, as a PNG
+    """
+    draws = True
+
+    def __init__(self, constants, keys=()):
+        self.root = libtcod.console_new(constants['screen_width'], constants['screen_height'])
+        self.keys = iter(keys)
+        self.closed = False
+
+        # Frames presented and scripted keys read, for benchmarks and bots
+        self.frames = 0
+        self.turns = 0
+
+    def is_closed(self):
+        return self.closed
+
+    def present(self):
+        self.frames += 1
+
+    def wait_for_input(self, key, mouse, constants):
+        mouse.lbutton_pressed = mouse.rbutton_pressed = False
+
+        name = next(self.keys, None)
+
+        if name is None:
+            key.vk = libtcod.KEY_NONE
+            key.c = 0
+            self.closed = True
+
+            return False
+
+        scripted_key(key, name)
+        self.turns += 1
+
+        return True
+
+    def toggle_fullscreen(self):
+        pass
+
+    def text(self):
+        # The characters of the last frame, one line per console row
+        return '\n'.join(''.join(chr(c) if c else ' ' for c in row) for row in self.root.ch)
+
+    def dump(self, path):
+        # Save the last frame: a PNG drawn with the game's font if path ends in .png, plain text otherwise
+        if path.endswith('.png'):
+            libtcod.console_set_custom_font('arial12x12.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+            libtcod.image_save(libtcod.image_from_console(self.root), path)
+        else:
+            with open(path, 'w') as f:
+                f.write(self.text() + '\n')
+
+
+class NullRenderer(OffscreenRenderer):
+    """
+    Draws nothing, so the turn loop runs at the speed of the game logic alone; input is scripted
+    as for the OffscreenRenderer
+    """
+    draws = False
+
+
+RENDERERS = {
+    'tcod': TcodRenderer,
+    'offscreen': OffscreenRenderer,
+    'null': NullRenderer
+}
+
+
+def new_renderer(name, constants, keys=()):
+    if name == 'tcod':
+        return TcodRenderer(constants)
+
+    return RENDERERS[name](constants, keys)
@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def slot_names(cls):
+    # Every slot declared along the class's MRO
+    names = []
+
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+
+        if isinstance(slots, str):
+            slots = (slots,)
+
+        names.extend(name for name in slots if name not in ('__dict__', '__weakref__'))
+
+    return tuple(names)
+
+
+class Slotted:
+    """
+    Base for the compact classes that declare __slots__ instead of carrying a __dict__ per instance.
+    Pickles an instance as a dict of its set slots, the same shape as the __dict__ in older saves,
+    and loads either by setting the attributes one by one
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in slot_names(type(self)) if hasattr(self, name)}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)